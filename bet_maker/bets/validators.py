@@ -1,16 +1,22 @@
 import time
+from typing import Optional
 
-from httpx import AsyncClient, RequestError
-from core.config import settings
+from httpx import RequestError
+from core.line_provider import refresh_event
 from core.logger import logger
 from fastapi import status
-from core.cache import cache
+from core.cache import closed_events, event_cache
 from core.utils import log_and_raise_error
 
 
-async def check_event_in_cache(event_id: int, events: dict) -> dict:
-    """Проверяет наличие события в кэше и возвращает событие."""
-    event = events.get(event_id)
+async def check_event_in_cache(event_id: int) -> dict:
+    """
+    Возвращает событие из кэша. Если события в кэше нет, запрашивает
+    только его у line_provider; отсутствие события запоминается.
+    """
+    event = event_cache.get(event_id)
+    if event is None and not event_cache.is_missing(event_id):
+        event = await fetch_event_to_cache(event_id)
     if not event:
         log_and_raise_error(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -31,37 +37,36 @@ async def check_event_deadline(event: dict) -> None:
         )
 
 
-async def fetch_and_update_cache() -> dict:
-    """Обновляет кэш с данными о событиях."""
-    logger.debug("Кэш устарел, происходит запрос для обновления.")
-    async with AsyncClient() as client:
-        try:
-            response = await client.get(
-                settings.event_url,
-                headers={"Authorization": f"Bearer {settings.line_provider_token}"},
-            )
-            response.raise_for_status()
-            events = response.json()
-            cache["event_ids"] = {event["event_id"]: event for event in events}
-            return cache["event_ids"]
-        except RequestError as e:
-            log_and_raise_error(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                message_error=f"Сервис недоступен: {str(e)}",
-                message_log=f"Ошибка подключения к сервису: {str(e)}",
-            )
-        except Exception as e:
-            log_and_raise_error(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                message_error=f"Непредвиденное исключение: {str(e)}",
-                message_log=f"Неожиданная ошибка: {str(e)}",
-            )
+async def fetch_event_to_cache(event_id: int) -> Optional[dict]:
+    """
+    Загружает в кэш событие, которого там нет: созданное после обновления
+    каталога, при старте сервиса или после долгой недоступности line_provider.
+    """
+    logger.debug(f"События с id {event_id} нет в кэше, запрос в line_provider.")
+    try:
+        return await refresh_event(event_id)
+    except RequestError as e:
+        log_and_raise_error(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            message_error=f"Сервис недоступен: {str(e)}",
+            message_log=f"Ошибка подключения к сервису: {str(e)}",
+        )
+    except Exception as e:
+        log_and_raise_error(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message_error=f"Непредвиденное исключение: {str(e)}",
+            message_log=f"Неожиданная ошибка: {str(e)}",
+        )
 
 
 async def check_cache(event_id: int) -> None:
     """Проверяет наличие события в кэше, обновляет кэш при необходимости."""
-    events = cache.get("event_ids")
-    if events is None:
-        events = await fetch_and_update_cache()
-    event = await check_event_in_cache(event_id, events)
+    # приём ставок закрыт по сообщению line_provider, событие убрано из кэша
+    if event_id in closed_events:
+        log_and_raise_error(
+            status_code=status.HTTP_403_FORBIDDEN,
+            message_error="На данное мероприятие больше нельзя зарегистрировать ставку.",
+            message_log=f"Событие с id {event_id} больше не принимает ставки.",
+        )
+    event = await check_event_in_cache(event_id)
     await check_event_deadline(event)
@@ -1,5 +1,168 @@
+import time
+from typing import Optional
+
 from cachetools import TTLCache
 
 from core.config import settings
+from core.single_flight import SingleFlight
+
+# Версия изменения события: (номер шарда line_provider, версия шарда).
+Version = tuple[int, int]
+
+
+class EventCache:
+    """
+    События, полученные от line_provider, по event_id. Основная часть
+    приходит с каталогом событий и считается свежей, пока свеж каталог;
+    события, запрошенные по отдельности, имеют свой момент загрузки.
+    Запись отдаётся, пока её возраст не превышает допустимый, даже если
+    очередное обновление не удалось. Отсутствующие в line_provider id
+    запоминаются на negative_cache_ttl секунд.
+
+    Пока кэш получает изменения событий от line_provider (live), записи
+    не устаревают: каждое изменение применяется сразу через apply.
+    Изменения приходят не по порядку и могут повторяться, поэтому у записи
+    хранится версия применённого изменения, а у каталога - версии шардов,
+    которые он отражает: изменение не новее них отбрасывается. Версии
+    сравниваются только в пределах шарда; изменение события, перенесённого
+    на другой шард, применяется всегда.
+    """
+
+    def __init__(self):
+        # event_id -> (событие, момент загрузки или None для событий каталога,
+        # (шард, версия) применённого изменения или None)
+        self.events: dict[int, tuple[dict, Optional[float], Optional[Version]]] = {}
+        # event_id -> (шард, версия) удаления или None
+        self.missing = TTLCache(
+            maxsize=settings.negative_cache_size, ttl=settings.negative_cache_ttl
+        )
+        self.source: Optional[list[dict]] = None
+        # версии шардов, изменения до которых учтены в каталоге
+        self.versions: Optional[list[int]] = None
+        self.updated_at = 0.0
+        self.live = False
+        # изменения, полученные во время загрузки каталога, см. begin_sync
+        self.recent: Optional[list[dict]] = None
+
+    @property
+    def age(self) -> float:
+        """Возраст каталога событий."""
+        return time.monotonic() - self.updated_at
+
+    def get(
+        self, event_id: int, max_staleness: float = settings.cache_max_staleness
+    ) -> Optional[dict]:
+        entry = self.events.get(event_id)
+        if entry is None:
+            return None
+        event, loaded_at, _ = entry
+        if (
+            not self.live
+            and time.monotonic() - (loaded_at or self.updated_at) > max_staleness
+        ):
+            return None
+        return event
+
+    def is_missing(self, event_id: int) -> bool:
+        return event_id in self.missing
+
+    def put(self, event: dict) -> None:
+        self.events[event["event_id"]] = (event, time.monotonic(), None)
+        self.missing.pop(event["event_id"], None)
+
+    def mark_missing(self, event_id: int, version: Optional[Version] = None) -> None:
+        self.events.pop(event_id, None)
+        self.missing[event_id] = version
+
+    def update(
+        self,
+        events: list[dict],
+        loaded_at: Optional[float] = None,
+        version: Optional[str] = None,
+    ) -> None:
+        """
+        Заменяет каталог копией, запрошенной в момент loaded_at по
+        time.monotonic(). Копия старше текущей не применяется. version -
+        версия каталога из заголовка X-Catalogue-Version line_provider.
+        """
+        if loaded_at is None:
+            loaded_at = time.monotonic()
+        if loaded_at < self.updated_at:
+            return
+        # тот же список приходит, когда line_provider ответил 304 Not Modified
+        if events is not self.source:
+            self.events = {event["event_id"]: (event, None, None) for event in events}
+            self.source = events
+        self.versions = [int(part) for part in version.split(".")] if version else None
+        self.updated_at = loaded_at
+        # изменения, полученные во время загрузки, могут быть новее копии
+        recent, self.recent = self.recent, None
+        for change in recent or ():
+            self.apply(change)
+
+    def begin_sync(self) -> None:
+        """
+        Начинает запоминать изменения до следующего update. Изменения,
+        запомненные прерванной загрузкой, сохраняются.
+        """
+        if self.recent is None:
+            self.recent = []
+
+    def is_outdated(self, change: dict) -> bool:
+        """Изменение не новее уже учтённого в кэше."""
+        shard, version = change.get("shard", 0), change["version"]
+        if (
+            self.versions is not None
+            and shard < len(self.versions)
+            and version <= self.versions[shard]
+        ):
+            return True
+        entry = self.events.get(change["event_id"])
+        applied = entry[2] if entry else self.missing.get(change["event_id"])
+        return applied is not None and applied[0] == shard and version <= applied[1]
+
+    def apply(self, change: dict) -> None:
+        """
+        Применяет изменение события от line_provider: новое состояние
+        события в поле event или удаление. Устаревшее изменение пропускается.
+        """
+        if self.recent is not None:
+            self.recent.append(change)
+        if self.is_outdated(change):
+            return
+        version = (change.get("shard", 0), change["version"])
+        event = change.get("event")
+        if event is None:
+            self.mark_missing(change["event_id"], version)
+        else:
+            self.events[event["event_id"]] = (event, None, version)
+            self.missing.pop(event["event_id"], None)
+
+    def drop(self, event_id: int) -> None:
+        self.events.pop(event_id, None)
+
+
+event_cache = EventCache()
+
+# События, приём ставок на которые закрыт по сообщению line_provider. Нужны,
+# пока в кэше может оказаться копия каталога, полученная до закрытия.
+closed_events = TTLCache(
+    maxsize=settings.closed_events_cache_size, ttl=settings.cache_ttl
+)
+
+# Последняя полученная от line_provider копия каталога событий, её ETag
+# для условных запросов (при ответе 304 Not Modified используется она)
+# и версия из заголовка X-Catalogue-Version.
+last_catalogue = {"etag": None, "events": None, "version": None}
+
+# Одно обновление каталога на процесс, сколько бы запросов ни ждали кэш.
+catalogue_refresh = SingleFlight()
+
+# Один запрос события к line_provider на event_id, сколько бы ставок его ни ждали.
+event_fetch = SingleFlight()
+
 
-cache = TTLCache(maxsize=settings.cache_max_size, ttl=settings.cache_ttl)
+def drop_closed_event(event_id: int) -> None:
+    """Убирает из кэша событие, приём ставок на которое закрыт."""
+    closed_events[event_id] = True
+    event_cache.drop(event_id)
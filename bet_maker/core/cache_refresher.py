@@ -0,0 +1,46 @@
+import asyncio
+from typing import Optional
+
+from core.cache import event_cache
+from core.config import settings
+from core.line_provider import refresh_event_cache
+from core.logger import logger
+
+
+class EventCacheRefresher:
+    """
+    Фоновое обновление кэша событий раньше, чем копия каталога устареет,
+    чтобы запросы на ставки не ждали line_provider. При ошибке обновления
+    запросы продолжают обслуживаться последней удачной копией в пределах
+    cache_max_staleness. Пока кэш получает изменения событий из RabbitMQ,
+    каталог не загружается.
+    """
+
+    def __init__(self):
+        self.refresh_task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        logger.info("Запущено фоновое обновление кэша событий.")
+        while True:
+            try:
+                # кэш обновляется изменениями событий из RabbitMQ
+                if not event_cache.live:
+                    await refresh_event_cache()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Не удалось обновить кэш событий: {e}")
+            await asyncio.sleep(settings.cache_refresh_interval)
+
+    async def start(self):
+        """Запускаем фоновую задачу обновления кэша."""
+        self.refresh_task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Останавливаем фоновую задачу обновления кэша."""
+        if self.refresh_task:
+            self.refresh_task.cancel()
+            try:
+                await self.refresh_task
+            except asyncio.CancelledError:
+                pass
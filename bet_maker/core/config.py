@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv, find_dotenv
 
@@ -22,17 +24,69 @@ class Settings(BaseSettings):
     rabbit_host: str = "localhost"
     rabbit_port: int = 5672
     rabbit_queue: str = "event_status_updates"
+    # рассылка line_provider всем процессам: закрытие приёма ставок и
+    # изменения событий; пока изменения приходят, каталог событий не
+    # загружается периодически
+    rabbit_events_exchange: str = "event_deltas"
+    event_deltas_enabled: bool = True
     line_provider_token: str = (
         "f3fb8928bad49887d2089f5ad04c2cb634bb1980db77fc8c3b111edad34f4eb7"
     )
+    # пул соединений, таймауты (в секундах) и повторы запросов к line_provider
+    line_provider_max_connections: int = 100
+    line_provider_max_keepalive: int = 20
+    line_provider_timeout: float = 5.0
+    line_provider_connect_timeout: float = 2.0
+    line_provider_retries: int = 2
+    line_provider_retry_backoff: float = 0.2
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_reset_timeout: float = 10.0
 
-    cache_max_size: int = 100
+    # каталог событий обновляется в фоне раз в cache_refresh_interval секунд,
+    # копия старше cache_max_staleness секунд для ставок не используется
+    cache_refresh_interval: float = 15.0
+    cache_max_staleness: float = 300.0
     cache_ttl: int = 60
+    # сколько секунд помнить id, которых нет в line_provider
+    negative_cache_ttl: float = 5.0
+    negative_cache_size: int = 10000
+    closed_events_cache_size: int = 10000
+    # общий для воркеров кэш каталога событий в Redis, не задан - выключен
+    shared_cache_url: Optional[str] = None
+    shared_cache_prefix: str = "bet_maker:catalogue"
+    shared_cache_socket_timeout: float = 1.0
+    # сколько секунд хранить вытесненную версию каталога для воркеров,
+    # которые уже прочитали current и загружают её
+    shared_cache_superseded_ttl: int = 30
+    # запас блокировки обновления каталога сверх худшего времени запроса
+    # к line_provider, см. shared_cache_lock_timeout
+    shared_cache_lock_margin: float = 5.0
+    shared_cache_lock_wait: float = 2.0
 
     first_user_username: str = "string"
     first_user_email: str = "example@example.com"
     first_user_password: str = "string"
     first_user_name: str = "string"
 
+    @property
+    def shared_cache_lock_timeout(self) -> float:
+        """
+        Срок блокировки обновления общего кэша каталога: худшее время запроса
+        к line_provider со всеми повторами (таймауты попыток и наибольшие
+        паузы между ними, см. LineProviderClient) и запас на разбор и запись
+        каталога в Redis. Иначе блокировка истекает во время загрузки и
+        каталог одновременно загружает второй воркер.
+        """
+        attempts = self.line_provider_retries + 1
+        backoff = sum(
+            self.line_provider_retry_backoff * 2 ** (attempt - 1)
+            for attempt in range(1, attempts)
+        )
+        return (
+            attempts * (self.line_provider_connect_timeout + self.line_provider_timeout)
+            + backoff
+            + self.shared_cache_lock_margin
+        )
+
 
 settings = Settings()
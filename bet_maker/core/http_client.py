@@ -0,0 +1,137 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+from httpx import AsyncClient, Limits, RequestError, Response, Timeout
+
+from core.config import settings
+from core.logger import logger
+
+
+class CircuitOpenError(RequestError):
+    """line_provider признан недоступным, запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold неудачных запросов подряд запросы отклоняются
+    сразу в течение reset_timeout секунд. Затем пропускается один пробный
+    запрос: при успехе запросы снова идут в line_provider, при ошибке
+    отказ продлевается.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def before_call(self) -> None:
+        if self.opened_at is None:
+            return
+        if (
+            self.trial_in_flight
+            or time.monotonic() - self.opened_at < self.reset_timeout
+        ):
+            raise CircuitOpenError("line_provider временно недоступен.")
+        self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("line_provider снова доступен.")
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Пробный запрос прерван без ответа line_provider, пропускаем следующий."""
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.error(
+                    f"line_provider недоступен после {self.failures} ошибок подряд, "
+                    f"запросы отклоняются {self.reset_timeout} с."
+                )
+            self.opened_at = time.monotonic()
+
+
+class LineProviderClient:
+    """
+    Общий для процесса HTTP-клиент line_provider с пулом keep-alive
+    соединений. Создаётся и закрывается в lifespan приложения. GET-запросы
+    при сетевых ошибках и ответах 5xx повторяются с экспоненциальной
+    задержкой со случайным разбросом.
+    """
+
+    def __init__(self):
+        self.client: Optional[AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.circuit_breaker_failure_threshold,
+            reset_timeout=settings.circuit_breaker_reset_timeout,
+        )
+
+    async def start(self):
+        """Создаём клиент с пулом соединений."""
+        self.client = AsyncClient(
+            headers={"Authorization": f"Bearer {settings.line_provider_token}"},
+            limits=Limits(
+                max_connections=settings.line_provider_max_connections,
+                max_keepalive_connections=settings.line_provider_max_keepalive,
+            ),
+            timeout=Timeout(
+                settings.line_provider_timeout,
+                connect=settings.line_provider_connect_timeout,
+            ),
+        )
+
+    async def close(self):
+        """Закрываем соединения пула."""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def get(self, url: str, headers: Optional[dict] = None) -> Response:
+        if self.client is None:
+            raise RuntimeError("HTTP-клиент line_provider не запущен.")
+        self.breaker.before_call()
+        try:
+            response = await self._get_with_retries(url, headers)
+        except RequestError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # отмена запроса или ошибка, не связанная с line_provider
+            self.breaker.release_trial()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def _get_with_retries(self, url: str, headers: Optional[dict]) -> Response:
+        for attempt in range(settings.line_provider_retries + 1):
+            if attempt:
+                # full jitter: повторы разных воркеров не приходят одновременно
+                delay = settings.line_provider_retry_backoff * 2 ** (attempt - 1)
+                await asyncio.sleep(random.uniform(0, delay))
+            try:
+                response = await self.client.get(url, headers=headers)
+            except RequestError as e:
+                if attempt == settings.line_provider_retries:
+                    raise
+                logger.warning(f"Ошибка запроса к line_provider: {e!r}")
+                continue
+            if response.status_code < 500:
+                return response
+            logger.warning(f"line_provider ответил {response.status_code}.")
+        return response
+
+
+line_provider_client = LineProviderClient()
@@ -0,0 +1,147 @@
+import time
+from typing import Optional
+
+import aioredis
+
+from core.cache import catalogue_refresh, event_cache, event_fetch, last_catalogue
+from core.config import settings
+from core.http_client import line_provider_client
+from core.logger import logger
+from core.shared_cache import CatalogueVersion, shared_catalogue
+
+
+async def fetch_events() -> list[dict]:
+    """
+    Запрашивает каталог событий у line_provider условным запросом. Если каталог
+    не изменился с прошлого запроса, line_provider отвечает 304 и используется
+    сохранённая копия без повторной загрузки и разбора JSON.
+    """
+    headers = {}
+    if last_catalogue["etag"] and last_catalogue["events"] is not None:
+        headers["If-None-Match"] = last_catalogue["etag"]
+    response = await line_provider_client.get(settings.event_url, headers=headers)
+    if response.status_code == 304:
+        logger.debug("Каталог событий не изменился, используется сохранённая копия.")
+        return last_catalogue["events"]
+    response.raise_for_status()
+    events = response.json()
+    last_catalogue["etag"] = response.headers.get("etag")
+    last_catalogue["events"] = events
+    last_catalogue["version"] = response.headers.get("x-catalogue-version")
+    return events
+
+
+def event_detail_url(event_id: int) -> str:
+    """Адрес события в line_provider рядом с адресом каталога EVENT_URL."""
+    return f"{settings.event_url.rsplit('/', 1)[0]}/event/{event_id}"
+
+
+async def fetch_event(event_id: int) -> Optional[dict]:
+    """Запрашивает одно событие у line_provider, None - события нет."""
+    response = await line_provider_client.get(event_detail_url(event_id))
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+async def refresh_event(event_id: int) -> Optional[dict]:
+    """
+    Загружает событие, которого нет в кэше, и запоминает результат, в том
+    числе отсутствие события. Параллельные вызовы для одного id ожидают
+    один запрос к line_provider.
+    """
+    return await event_fetch.do(event_id, lambda: _refresh_event(event_id))
+
+
+async def _refresh_event(event_id: int) -> Optional[dict]:
+    event = await fetch_event(event_id)
+    if event is None:
+        event_cache.mark_missing(event_id)
+    else:
+        event_cache.put(event)
+    return event
+
+
+async def refresh_event_cache() -> None:
+    """
+    Загружает каталог событий и обновляет кэш. Параллельные вызовы ожидают
+    одну загрузку вместо собственных запросов к line_provider.
+    """
+    return await catalogue_refresh.do("event_ids", _refresh_event_cache)
+
+
+async def resync_event_cache() -> None:
+    """
+    Загружает каталог напрямую из line_provider, минуя общий кэш: копия в
+    Redis может быть старше пропущенных изменений событий. Загрузка не
+    объединяется с другими, поэтому её отмена прерывает сам запрос, а
+    следующий вызов получает каталог заново.
+    """
+    started_at = time.monotonic()
+    event_cache.begin_sync()
+    events = await fetch_events()
+    event_cache.update(events, loaded_at=started_at, version=last_catalogue["version"])
+    logger.debug("Кэш событий синхронизирован с line_provider.")
+
+
+async def _refresh_event_cache() -> None:
+    started_at = time.monotonic()
+    if shared_catalogue.enabled:
+        try:
+            if await _refresh_from_shared_cache():
+                return
+        except aioredis.exceptions.RedisError as e:
+            logger.error(f"Общий кэш событий недоступен: {e}")
+    events = await fetch_events()
+    event_cache.update(events, loaded_at=started_at, version=last_catalogue["version"])
+    logger.debug("Кэш событий обновлён.")
+
+
+async def _refresh_from_shared_cache() -> bool:
+    """
+    Обновляет кэш из общего кэша в Redis, а если там нет свежего каталога,
+    загружает его из line_provider под блокировкой и сохраняет для
+    остальных воркеров. False - нужно обратиться к line_provider напрямую.
+    """
+    current = await shared_catalogue.current()
+    if current is not None and current.age < settings.cache_refresh_interval:
+        if await _load_shared_catalogue(current):
+            return True
+    token = await shared_catalogue.acquire_lock()
+    if token is None:
+        updated = await shared_catalogue.wait_for_update(
+            after=current.updated_at if current else 0.0
+        )
+        if updated is None or not await _load_shared_catalogue(updated):
+            logger.debug("Каталог обновляет другой воркер, используется текущая копия.")
+        return True
+    try:
+        started_at = time.monotonic()
+        events = await fetch_events()
+        event_cache.update(
+            events, loaded_at=started_at, version=last_catalogue["version"]
+        )
+        logger.debug("Кэш событий обновлён.")
+        last_catalogue["etag"] = await shared_catalogue.store(
+            last_catalogue["etag"], events
+        )
+    except aioredis.exceptions.RedisError as e:
+        logger.error(f"Не удалось сохранить каталог в общий кэш событий: {e}")
+    finally:
+        await shared_catalogue.release_lock(token)
+    return True
+
+
+async def _load_shared_catalogue(current: CatalogueVersion) -> bool:
+    if current.version == last_catalogue["etag"] and last_catalogue["events"]:
+        events = last_catalogue["events"]
+    else:
+        events = await shared_catalogue.load(current.version)
+        if events is None:
+            return False
+        # версия каталога line_provider в общем кэше не хранится
+        last_catalogue.update(etag=current.version, events=events, version=None)
+    event_cache.update(events, loaded_at=time.monotonic() - current.age)
+    logger.debug(f"Кэш событий обновлён из общего кэша, версия {current.version}.")
+    return True
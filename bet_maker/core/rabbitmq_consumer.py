@@ -2,15 +2,23 @@ import asyncio
 import json
 from typing import Optional
 
-from aio_pika import connect, IncomingMessage, Connection
+from aio_pika import connect, Channel, ExchangeType, IncomingMessage, Connection
 from sqlalchemy import update
 
 from bets.enums import BetStatuses
+from core.cache import drop_closed_event, event_cache
 from core.config import settings
 from core.db import AsyncSessionLocal
+from core.line_provider import resync_event_cache
 from core.logger import logger
 from core.models import Bet
 
+# Тип сообщения line_provider о закрытии приёма ставок по дедлайну.
+# Сообщения о смене статуса события приходят без поля type.
+BETTING_CLOSED = "betting_closed"
+# Изменение события для локального кэша.
+EVENT_CHANGED = "event_changed"
+
 
 class RabbitMQConsumer:
     def __init__(self):
@@ -18,6 +26,7 @@ class RabbitMQConsumer:
         self.rabbit_port = settings.rabbit_port
         self.connection: Optional[Connection] = None
         self.consume_task: Optional[asyncio.Task] = None
+        self.resync_task: Optional[asyncio.Task] = None
 
     async def connect(self):
         if not self.connection:
@@ -33,9 +42,14 @@ class RabbitMQConsumer:
                 message_body = message.body.decode()
                 event_data = json.loads(message_body)
                 event_id = event_data["event_id"]
-                new_status = event_data["state"]
 
-                await self._update_bets_status(event_id, new_status)
+                if event_data.get("type") == BETTING_CLOSED:
+                    # прежние версии line_provider публиковали закрытие приёма
+                    # ставок в общую очередь
+                    drop_closed_event(event_id)
+                    logger.debug(f"Приём ставок на событие {event_id} закрыт.")
+                else:
+                    await self._update_bets_status(event_id, event_data["state"])
 
                 await message.ack()
                 logger.debug("Сообщение обработано.")
@@ -44,6 +58,63 @@ class RabbitMQConsumer:
                 logger.error(f"Ошибка при обработке сообщения: {e}")
                 await message.reject(requeue=True)
 
+    async def process_delta(self, message: IncomingMessage) -> None:
+        """
+        Обрабатываем сообщение, которое line_provider рассылает всем процессам:
+        закрытие приёма ставок или изменение события для кэша.
+        """
+        try:
+            change = json.loads(message.body)
+            if change.get("type") == BETTING_CLOSED:
+                drop_closed_event(change["event_id"])
+                logger.debug(f"Приём ставок на событие {change['event_id']} закрыт.")
+            elif change.get("type") == EVENT_CHANGED and settings.event_deltas_enabled:
+                event_cache.apply(change)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке изменения события: {e}")
+
+    def start_resync(self) -> None:
+        """Перезапускаем загрузку каталога: прежняя могла не учесть изменения."""
+        event_cache.live = False
+        if self.resync_task:
+            self.resync_task.cancel()
+        self.resync_task = asyncio.create_task(self.resync())
+
+    async def resync(self) -> None:
+        """Загружаем каталог, после чего кэш обновляется только изменениями."""
+        while True:
+            try:
+                await resync_event_cache()
+                event_cache.live = True
+                logger.info("Кэш событий получает изменения от line_provider.")
+                return
+            except Exception as e:
+                logger.error(f"Не удалось загрузить каталог событий: {e}")
+            await asyncio.sleep(settings.cache_refresh_interval)
+
+    def on_connection_closed(self, *args) -> None:
+        # без изменений событий кэш снова обновляется периодически
+        event_cache.live = False
+        if self.resync_task:
+            self.resync_task.cancel()
+
+    async def consume_deltas(self, channel: Channel):
+        """
+        Подписываемся своей временной очередью на сообщения, которые
+        line_provider рассылает всем процессам bet_maker.
+        """
+        exchange = await channel.declare_exchange(
+            settings.rabbit_events_exchange, ExchangeType.FANOUT
+        )
+        queue = await channel.declare_queue(exclusive=True)
+        await queue.bind(exchange)
+        await queue.consume(self.process_delta, no_ack=True)
+        logger.info("Начат приём рассылки line_provider из RabbitMQ")
+        if settings.event_deltas_enabled:
+            self.connection.close_callbacks.add(self.on_connection_closed)
+            # изменения, пришедшие во время загрузки, применятся поверх каталога
+            self.start_resync()
+
     @staticmethod
     async def _update_bets_status(event_id: int, new_status: int) -> None:
         """Обновляем статус ставок для события"""
@@ -68,6 +139,7 @@ class RabbitMQConsumer:
         queue = await channel.declare_queue(settings.rabbit_queue, durable=True)
         await queue.consume(self.process_message, no_ack=False)
         logger.info("Начат прием сообщений из очереди RabbitMQ")
+        await self.consume_deltas(channel)
 
     async def start_consume(self):
         """Запускаем фоновую задачу для потребления сообщений"""
@@ -75,6 +147,8 @@ class RabbitMQConsumer:
 
     async def close(self):
         """Закрываем соединение с RabbitMQ"""
+        if self.resync_task:
+            self.resync_task.cancel()
         if self.consume_task:
             self.consume_task.cancel()
             try:
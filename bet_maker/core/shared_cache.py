@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+import aioredis
+
+from core.config import settings
+from core.logger import logger
+
+# Снимает блокировку, только если она всё ещё принадлежит этому воркеру.
+RELEASE_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class CatalogueVersion(NamedTuple):
+    version: str
+    updated_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated_at
+
+
+class SharedCatalogueCache:
+    """
+    Общий для воркеров и подов bet_maker кэш каталога событий в Redis,
+    второй уровень под EventCache. Каталог хранится под ключом со своей
+    версией (ETag line_provider), ключ current указывает на последнюю
+    версию и время её загрузки, прежняя версия после замены хранится
+    shared_cache_superseded_ttl секунд. Обновляет каталог из line_provider
+    только воркер, взявший блокировку, остальные читают результат из Redis.
+    """
+
+    def __init__(self):
+        self.redis: Optional[aioredis.Redis] = None
+        self.prefix = settings.shared_cache_prefix
+        self.ttl = int(settings.cache_max_staleness)
+        self.superseded_ttl = min(settings.shared_cache_superseded_ttl, self.ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis is not None
+
+    async def connect(self):
+        """Подключаемся к Redis, если общий кэш включён."""
+        if not settings.shared_cache_url:
+            return
+        try:
+            self.redis = aioredis.from_url(
+                settings.shared_cache_url,
+                socket_timeout=settings.shared_cache_socket_timeout,
+                socket_connect_timeout=settings.shared_cache_socket_timeout,
+            )
+            await self.redis.ping()
+            logger.info("Подключён общий кэш событий в Redis.")
+        except Exception as e:
+            logger.error(f"Ошибка при попытке подключения к Redis: {e}")
+            raise
+
+    async def close(self):
+        if self.redis:
+            await self.redis.close()
+            self.redis = None
+
+    async def current(self) -> Optional[CatalogueVersion]:
+        data = await self.redis.get(f"{self.prefix}:current")
+        if data is None:
+            return None
+        return CatalogueVersion(**json.loads(data))
+
+    async def load(self, version: str) -> Optional[list[dict]]:
+        data = await self.redis.get(f"{self.prefix}:{version}")
+        return None if data is None else json.loads(data)
+
+    async def store(self, version: Optional[str], events: list[dict]) -> str:
+        """Сохраняет каталог и делает его текущей версией."""
+        data = None
+        if version is None:
+            data = json.dumps(events, separators=(",", ":"))
+            version = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        key = f"{self.prefix}:{version}"
+        # каталог этой версии уже сохранён другим воркером - продлеваем срок
+        if not await self.redis.expire(key, self.ttl):
+            if data is None:
+                data = json.dumps(events, separators=(",", ":"))
+            await self.redis.set(key, data, ex=self.ttl)
+        previous = await self.current()
+        current = {"version": version, "updated_at": time.time()}
+        await self.redis.set(f"{self.prefix}:current", json.dumps(current), ex=self.ttl)
+        # вытесненная версия нужна только воркерам, уже читающим её, поэтому
+        # её копия не копится в Redis до конца срока cache_max_staleness
+        if previous is not None and previous.version != version:
+            await self.redis.expire(
+                f"{self.prefix}:{previous.version}", self.superseded_ttl
+            )
+        return version
+
+    async def acquire_lock(self) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if await self.redis.set(
+            f"{self.prefix}:lock",
+            token,
+            nx=True,
+            px=int(settings.shared_cache_lock_timeout * 1000),
+        ):
+            return token
+        return None
+
+    async def release_lock(self, token: str) -> None:
+        try:
+            await self.redis.eval(RELEASE_LOCK, 1, f"{self.prefix}:lock", token)
+        except aioredis.exceptions.RedisError as e:
+            # блокировка снимется сама через shared_cache_lock_timeout
+            logger.error(f"Не удалось снять блокировку общего кэша событий: {e}")
+
+    async def wait_for_update(self, after: float) -> Optional[CatalogueVersion]:
+        """Ждёт, пока воркер с блокировкой сохранит каталог новее after."""
+        deadline = time.monotonic() + settings.shared_cache_lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            current = await self.current()
+            if current is not None and current.updated_at > after:
+                return current
+        return None
+
+
+shared_catalogue = SharedCatalogueCache()
@@ -0,0 +1,31 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Объединяет параллельные вызовы с одинаковым ключом: выполняется только
+    первый, остальные ждут его результат или исключение.
+    """
+
+    def __init__(self):
+        self.calls: dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]):
+        task = self.calls.get(key)
+        if task is None:
+            self.stats["calls"] += 1
+            task = self.calls[key] = asyncio.create_task(func())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # отмена одного ожидающего запроса не должна отменять общий вызов
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # исключение уже получили ожидающие, если они были
+            task.exception()
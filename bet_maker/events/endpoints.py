@@ -1,8 +1,10 @@
+import time
+
 from fastapi import APIRouter, Depends, status
-from httpx import AsyncClient, RequestError
+from httpx import RequestError
 
-from core.cache import cache
-from core.config import settings
+from core.cache import catalogue_refresh, event_cache, event_fetch, last_catalogue
+from core.line_provider import fetch_events
 from core.logger import logger
 from core.utils import log_and_raise_error
 from users.authentication_utils import get_current_user
@@ -15,28 +17,35 @@ router = APIRouter(
 
 @router.get("/events")
 async def get_events() -> list[dict]:
-    async with AsyncClient() as client:
-        try:
-            response = await client.get(
-                settings.event_url,
-                headers={"Authorization": f"Bearer {settings.line_provider_token}"},
-            )
-            response.raise_for_status()
-            events = response.json()
-
-            cache["event_ids"] = {event["event_id"]: event for event in events}
-            logger.debug("Кэш записан")
-
-            return events
-        except RequestError as e:
-            log_and_raise_error(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                message_error=f"Сервис недоступен: {str(e)}",
-                message_log=f"Сервис недоступен: {str(e)}",
-            )
-        except Exception as e:
-            log_and_raise_error(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                message_error=f"Непредвиденное исключение: {str(e)}",
-                message_log=f"Непредвиденное исключение: {str(e)}",
-            )
+    try:
+        started_at = time.monotonic()
+        events = await fetch_events()
+
+        event_cache.update(
+            events, loaded_at=started_at, version=last_catalogue["version"]
+        )
+        logger.debug("Кэш записан")
+
+        return events
+    except RequestError as e:
+        log_and_raise_error(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            message_error=f"Сервис недоступен: {str(e)}",
+            message_log=f"Сервис недоступен: {str(e)}",
+        )
+    except Exception as e:
+        log_and_raise_error(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message_error=f"Непредвиденное исключение: {str(e)}",
+            message_log=f"Непредвиденное исключение: {str(e)}",
+        )
+
+
+@router.get("/events/cache/stats")
+async def get_events_cache_stats() -> dict:
+    """
+    Счётчики обновлений кэша событий для каталога (catalogue) и отдельных
+    событий (events): calls - запросы к line_provider, coalesced - ожидания
+    уже выполняющегося запроса.
+    """
+    return {"catalogue": catalogue_refresh.stats, "events": event_fetch.stats}
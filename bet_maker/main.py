@@ -8,10 +8,13 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from core.cache_refresher import EventCacheRefresher
 from core.config import settings
 from core.db import get_async_session
+from core.http_client import line_provider_client
 from core.logger import logger, request_log
 from core.rabbitmq_consumer import RabbitMQConsumer
+from core.shared_cache import shared_catalogue
 from routers import main_router
 from users.authentication_utils import (
     authenticate_user,
@@ -20,17 +23,28 @@ from users.authentication_utils import (
 from users.first_user import create_first_user
 
 rabbitmq_consumer = RabbitMQConsumer()
+event_cache_refresher = EventCacheRefresher()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Создаётся первый суперпользователь или проверяется его наличие.")
     await create_first_user()
+    logger.info("Создаётся HTTP-клиент line_provider.")
+    await line_provider_client.start()
     logger.info("Происходит инициализация потребителя сообщений.")
     await rabbitmq_consumer.start_consume()
+    await shared_catalogue.connect()
+    logger.info("Запуск фонового обновления кэша событий.")
+    await event_cache_refresher.start()
     yield
+    logger.info("Остановка фонового обновления кэша событий.")
+    await event_cache_refresher.close()
     logger.info("Закрытие соединения с RabbitMQ")
     await rabbitmq_consumer.close()
+    logger.info("Закрытие HTTP-клиента line_provider и общего кэша событий.")
+    await line_provider_client.close()
+    await shared_catalogue.close()
 
 
 app = FastAPI(title="Bet Maker", lifespan=lifespan)
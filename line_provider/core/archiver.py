@@ -0,0 +1,57 @@
+import asyncio
+import time
+from typing import Optional
+
+from core.config import settings
+from core.logger import logger
+from events.base import EventStorage
+
+
+class EventArchiver:
+    """
+    Фоновый перенос рассчитанных событий в архив по истечении
+    archive_grace_period, чтобы рабочий хэш содержал только живые события.
+    """
+
+    def __init__(self, storage: EventStorage):
+        self.storage = storage
+        self.archive_task: Optional[asyncio.Task] = None
+
+    async def archive_settled(self) -> int:
+        """Переносит в архив все события, срок ожидания которых истёк."""
+        settled_before = int(time.time()) - settings.archive_grace_period
+        total = 0
+        while True:
+            archived = await self.storage.archive_settled_events(
+                settled_before, settings.archive_batch_size
+            )
+            total += archived
+            if archived < settings.archive_batch_size:
+                break
+        if total:
+            logger.info(f"В архив перенесено {total} рассчитанных событий.")
+        return total
+
+    async def run(self):
+        logger.info("Запущен перенос рассчитанных событий в архив.")
+        while True:
+            try:
+                await self.archive_settled()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при переносе событий в архив: {e}")
+            await asyncio.sleep(settings.archive_interval)
+
+    async def start(self):
+        """Запускаем фоновую задачу архивации."""
+        self.archive_task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Останавливаем фоновую задачу архивации."""
+        if self.archive_task:
+            self.archive_task.cancel()
+            try:
+                await self.archive_task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from typing import Optional
+
+from core.logger import logger
+from events.codecs import decode_event, to_json_bytes
+from events.base import EventStorageShard
+
+
+class CatalogueSnapshot:
+    """
+    Готовый JSON каталога событий одного хранилища для GET /events без
+    параметров. События хранятся уже закодированными в JSON и обновляются
+    по изменениям из общей подписки процесса (core.change_listener), после
+    (пере)подключения подписки снимок пересобирается в фоне. Пока снимок не
+    готов, get_events_json возвращает None и каталог читается из Redis.
+
+    version - версия каталога, которую снимок уже отражает: версия на момент
+    подписки и версии применённых изменений. Версия хранилища может её
+    опережать, пока уведомление об изменении не дошло до подписки, поэтому
+    ETag снимка строится по version.
+    """
+
+    def __init__(self, storage: EventStorageShard):
+        self.storage = storage
+        self.events: dict[int, bytes] = {}
+        self.events_json: Optional[bytes] = None
+        self.ready = False
+        self.version = 0
+        self.pending: Optional[list[dict]] = None
+        self.rebuild_task: Optional[asyncio.Task] = None
+
+    def get_events_json(self) -> Optional[bytes]:
+        """События через запятую, без обрамляющих скобок массива."""
+        if not self.ready:
+            return None
+        if self.events_json is None:
+            self.events_json = b",".join(self.events.values())
+        return self.events_json
+
+    def apply(self, change: dict) -> None:
+        if "event" in change:
+            self.events[change["event_id"]] = json.dumps(
+                change["event"], separators=(",", ":")
+            ).encode("utf-8")
+        else:
+            self.events.pop(change["event_id"], None)
+        self.events_json = None
+        self.version = max(self.version, change["version"])
+
+    async def rebuild(self) -> None:
+        events = {}
+        async for chunk in self.storage.iter_events():
+            for event_data in chunk:
+                events[decode_event(event_data)["event_id"]] = to_json_bytes(event_data)
+        self.events = events
+        # изменения, пришедшие во время чтения, не старше прочитанных данных
+        for change in self.pending:
+            self.apply(change)
+        self.pending = None
+        self.events_json = None
+        self.ready = True
+        logger.info(f"Снимок каталога собран: {len(self.events)} событий.")
+
+    async def run_rebuild(self) -> None:
+        try:
+            await self.rebuild()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при сборке снимка каталога: {e}")
+
+    def on_subscribed(self, version) -> None:
+        self.version = int(version)
+        self.pending = []
+        self.rebuild_task = asyncio.create_task(self.run_rebuild())
+
+    def on_change(self, change: dict) -> None:
+        if self.pending is not None:
+            self.pending.append(change)
+        elif self.ready:
+            self.apply(change)
+
+    def on_unsubscribed(self) -> None:
+        if self.rebuild_task:
+            self.rebuild_task.cancel()
+        self.ready = False
+        self.pending = None
+        self.events = {}
+        self.events_json = None
@@ -0,0 +1,70 @@
+import asyncio
+import json
+from typing import Optional
+
+from core.config import settings
+from core.logger import logger
+from events.base import EventStorageShard
+
+
+class ChangeListener:
+    """
+    Единственная на процесс подписка на канал изменений событий в Redis.
+
+    Каждое сообщение передаётся всем зарегистрированным обработчикам. Обработчик
+    реализует методы on_subscribed(version), on_change(change) и
+    on_unsubscribed(), последний вызывается при потере подписки, после чего
+    подписка восстанавливается.
+    """
+
+    def __init__(self, storage: EventStorageShard):
+        self.storage = storage
+        self.handlers = []
+        self.listen_task: Optional[asyncio.Task] = None
+
+    def add_handler(self, handler) -> None:
+        self.handlers.append(handler)
+
+    async def listen(self):
+        pubsub = await self.storage.subscribe_changes()
+        try:
+            version = await self.storage.get_catalogue_version()
+            for handler in self.handlers:
+                handler.on_subscribed(version)
+            logger.info("Подписка на изменения событий установлена.")
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is None:
+                    continue
+                change = json.loads(message["data"])
+                for handler in self.handlers:
+                    handler.on_change(change)
+        finally:
+            for handler in self.handlers:
+                handler.on_unsubscribed()
+            await pubsub.close()
+
+    async def run(self):
+        while True:
+            try:
+                await self.listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Потеряна подписка на изменения событий: {e}")
+            await asyncio.sleep(settings.change_listener_retry_delay)
+
+    async def start(self):
+        """Запускаем фоновую задачу подписки на изменения."""
+        self.listen_task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Останавливаем фоновую задачу подписки на изменения."""
+        if self.listen_task:
+            self.listen_task.cancel()
+            try:
+                await self.listen_task
+            except asyncio.CancelledError:
+                pass
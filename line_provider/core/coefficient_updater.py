@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Optional
+
+from core.config import settings
+from core.logger import logger
+from events.base import EventStorage
+from events.enums import CoefficientUpdateResult
+
+
+class CoefficientUpdater:
+    """
+    Приём частых обновлений коэффициентов с объединением по событию.
+    Обновления копятся в памяти, раз в coefficient_flush_interval в Redis
+    одним пайплайном записывается последний коэффициент каждого события,
+    поэтому на событие приходится не больше одной записи и одного
+    уведомления об изменении за окно. Каждый коэффициент записывается со
+    временем приёма: при нескольких процессах Redis не даёт более старому
+    значению затереть принятое позже.
+    """
+
+    def __init__(self, storage: EventStorage):
+        self.storage = storage
+        # event_id -> (коэффициент, время приёма в микросекундах)
+        self.pending: dict[int, tuple[float, int]] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+
+    def submit(self, event_id: int, coefficient: float) -> bool:
+        """
+        Ставит коэффициент в очередь на запись, заменяя ещё не записанный.
+        Возвращает False, если очередь переполнена.
+        """
+        if (
+            event_id not in self.pending
+            and len(self.pending) >= settings.coefficient_pending_max_size
+        ):
+            return False
+        self.pending[event_id] = (coefficient, time.time_ns() // 1000)
+        return True
+
+    async def flush(self) -> int:
+        """Записывает накопленные коэффициенты и возвращает их число."""
+        if not self.pending:
+            return 0
+        updates, self.pending = self.pending, {}
+        try:
+            results = await self.storage.update_coefficients(updates)
+        except Exception:
+            # более свежие значения, пришедшие во время записи, не затираем
+            for event_id, update in updates.items():
+                self.pending.setdefault(event_id, update)
+            raise
+        skipped = Counter(
+            result
+            for result in results.values()
+            if result
+            not in (CoefficientUpdateResult.UPDATED, CoefficientUpdateResult.UNCHANGED)
+        )
+        if skipped:
+            logger.warning(
+                "Коэффициенты не записаны: "
+                + ", ".join(
+                    f"{result.name} - {count}" for result, count in skipped.items()
+                )
+            )
+        return len(updates)
+
+    async def run(self):
+        logger.info("Запущена запись обновлений коэффициентов.")
+        while True:
+            await asyncio.sleep(settings.coefficient_flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при записи коэффициентов: {e}")
+
+    async def start(self):
+        """Запускаем фоновую задачу записи коэффициентов."""
+        self.flush_task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Останавливаем фоновую задачу и записываем оставшиеся коэффициенты."""
+        if self.flush_task:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Не удалось записать оставшиеся коэффициенты: {e}")
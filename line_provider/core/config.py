@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv, find_dotenv
 
@@ -7,6 +9,20 @@ load_dotenv(find_dotenv())
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
     redis_connect_url: str = "redis://line_redis"
+    # параметры общего пула соединений с Redis
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 2.0
+    redis_socket_timeout: float = 2.0
+    redis_socket_connect_timeout: float = 2.0
+    redis_health_check_interval: int = 30
+    # шарды хранилища событий, первый хранит счётчик id событий;
+    # без списка используется только redis_connect_url
+    redis_shard_urls: list[str] = []
+    # имена шардов в порядке redis_shard_urls, по ним события распределяются
+    # по кольцу; без списка шард называется по номеру: shard-0, shard-1, ...
+    # Адрес шарда (пароль, хост) можно менять, имя - нет.
+    redis_shard_names: list[str] = []
+    redis_shard_replicas: int = 160
     minimum_event_duration: int = 5000
     # значение по умолчанию в случае отсутствия в .env
     line_provider_token: str = (
@@ -14,10 +30,72 @@ class Settings(BaseSettings):
     )
     redis_hash_name: str = "redis_hash_name"
     max_id_key: str = "max_id_key"
+    # формат хранения событий в Redis: json или msgpack
+    event_storage_format: Literal["json", "msgpack"] = "json"
+    # redis или memory - события в памяти процесса, для одного узла и замеров
+    event_storage_backend: Literal["redis", "memory"] = "redis"
+    # размер порции HSCAN при постраничной и потоковой выдаче событий
+    events_page_size: int = 500
+    events_page_max_size: int = 5000
+    # максимальный размер пакетных запросов создания и смены статуса событий
+    events_batch_max_size: int = 5000
+
+    # кэш чтения событий внутри процесса, инвалидируемый через pub/sub Redis
+    read_cache_enabled: bool = True
+    read_cache_size: int = 10000
+    read_cache_lists_size: int = 64
+    change_listener_retry_delay: float = 1.0
+
+    # готовый JSON каталога для GET /events без параметров
+    catalogue_snapshot_enabled: bool = True
+
+    # лента изменений событий для клиентов (Server-Sent Events)
+    feed_queue_size: int = 1000
+    feed_heartbeat_interval: float = 15.0
+
+    # закрытие приёма ставок по наступлении дедлайна события
+    deadline_check_interval: float = 1.0
+    deadline_batch_size: int = 500
+
+    # объединение частых обновлений коэффициентов: в Redis за окно
+    # записывается только последнее значение для каждого события
+    coefficient_flush_interval: float = 0.1
+    coefficient_pending_max_size: int = 100000
+
+    # перенос рассчитанных событий в архив: через archive_grace_period секунд
+    # после расчёта, проверка раз в archive_interval секунд;
+    # archive_ttl - срок хранения в архиве в секундах, 0 - без срока
+    archive_grace_period: int = 3600
+    archive_interval: float = 60.0
+    archive_batch_size: int = 500
+    archive_ttl: int = 0
+    # сколько версий каталога журнал изменений хранит записи об удалённых
+    # и перенесённых в архив событиях, 0 - без срока; клиенту ленты
+    # изменений с более старой версией нужна полная синхронизация
+    changes_tombstone_retention: int = 100_000
 
     rabbit_host: str = "localhost"
     rabbit_port: int = 5672
     rabbit_queue: str = "event_status_updates"
+    # пул каналов публикации, размер пачки, ёмкость внутренней очереди
+    # (при её заполнении публикующие ждут) и таймаут подтверждения брокера
+    rabbit_publish_channels: int = 4
+    rabbit_publish_batch_size: int = 100
+    rabbit_publish_queue_size: int = 10000
+    rabbit_publish_timeout: float = 10.0
+    # fanout exchange рассылки всем процессам bet_maker: закрытие приёма
+    # ставок и изменения событий для локальных кэшей
+    rabbit_events_exchange: str = "event_deltas"
+    event_deltas_enabled: bool = True
+
+    # outbox сообщений о смене статусов и его фоновая публикация в RabbitMQ;
+    # outbox_block_ms должно быть меньше redis_socket_timeout
+    outbox_group: str = "rabbitmq_relay"
+    outbox_batch_size: int = 100
+    outbox_block_ms: int = 1000
+    outbox_claim_idle_ms: int = 30000
+    outbox_retry_delay: float = 0.5
+    outbox_retry_max_delay: float = 30.0
 
 
 settings = Settings()
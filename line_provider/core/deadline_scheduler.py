@@ -0,0 +1,58 @@
+import asyncio
+import time
+from typing import Optional
+
+from core.config import settings
+from core.logger import logger
+from events.base import EventStorage
+
+
+class DeadlineScheduler:
+    """
+    Фоновое закрытие приёма ставок на события, дедлайн которых наступил.
+    События выбираются по индексу открытых событий, упорядоченному по
+    дедлайну, о закрытии сообщается в RabbitMQ через outbox.
+    """
+
+    def __init__(self, storage: EventStorage):
+        self.storage = storage
+        self.schedule_task: Optional[asyncio.Task] = None
+
+    async def close_expired(self) -> int:
+        """Закрывает приём ставок на все события с наступившим дедлайном."""
+        now = int(time.time())
+        total = 0
+        while True:
+            closed = await self.storage.close_expired_betting(
+                now, settings.deadline_batch_size
+            )
+            total += closed
+            if closed < settings.deadline_batch_size:
+                break
+        if total:
+            logger.info(f"Закрыт приём ставок на {total} событий.")
+        return total
+
+    async def run(self):
+        logger.info("Запущено закрытие приёма ставок по дедлайну.")
+        while True:
+            try:
+                await self.close_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при закрытии приёма ставок: {e}")
+            await asyncio.sleep(settings.deadline_check_interval)
+
+    async def start(self):
+        """Запускаем фоновую задачу закрытия приёма ставок."""
+        self.schedule_task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Останавливаем фоновую задачу закрытия приёма ставок."""
+        if self.schedule_task:
+            self.schedule_task.cancel()
+            try:
+                await self.schedule_task
+            except asyncio.CancelledError:
+                pass
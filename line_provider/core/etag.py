@@ -0,0 +1,23 @@
+import hashlib
+
+from fastapi import Request
+
+
+def make_etag(version: int, variant: str = "") -> str:
+    """
+    Строгий ETag по версии каталога. variant различает представления одной
+    версии, например разные параметры запроса списка событий.
+    """
+    if variant:
+        digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:12]
+        return f'"{version}-{digest}"'
+    return f'"{version}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Проверяет, совпадает ли ETag с одним из значений заголовка If-None-Match."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
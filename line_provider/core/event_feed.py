@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+from core.config import settings
+from core.logger import logger
+
+# Кадр, после которого клиент должен заново загрузить каталог: часть
+# изменений могла быть пропущена.
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+class EventFeed:
+    """
+    Раздача изменений событий подключённым клиентам в формате Server-Sent
+    Events. Получает изменения от общей для процесса подписки
+    (core.change_listener.ChangeListener), кодирует каждое один раз и кладёт
+    в ограниченные очереди клиентов. Клиент, не успевающий читать, получает
+    кадр resync и отключается.
+    """
+
+    def __init__(self):
+        self.subscribers: set[asyncio.Queue] = set()
+
+    def broadcast(self, frame: bytes) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                logger.warning("Клиент ленты событий не успевает, отключаем.")
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_FRAME)
+                queue.put_nowait(None)
+
+    def on_subscribed(self, version) -> None:
+        pass
+
+    def on_change(self, change: dict) -> None:
+        if "event" in change:
+            frame_type = b"change"
+        elif change.get("deleted"):
+            frame_type = b"delete"
+        else:
+            # уведомление без изменения каталога, например перенос между шардами
+            return
+        if self.subscribers:
+            data = json.dumps(change, separators=(",", ":")).encode("utf-8")
+            self.broadcast(b"event: " + frame_type + b"\ndata: " + data + b"\n\n")
+
+    def on_unsubscribed(self) -> None:
+        self.broadcast(RESYNC_FRAME)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """Кадры ленты для одного клиента, пока он подключён."""
+        queue = asyncio.Queue(maxsize=settings.feed_queue_size)
+        self.subscribers.add(queue)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(
+                        queue.get(), settings.feed_heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    frame = HEARTBEAT_FRAME
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.subscribers.discard(queue)
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import socket
+from typing import Optional
+
+from core.config import settings
+from core.logger import logger
+from core.rabbit_producer import RabbitMQProducer
+from events.base import EventStorageShard
+from events.enums import OutboxMessageType
+
+# Сообщения, которые должен получить каждый процесс bet_maker, а не один из них.
+BROADCAST_MESSAGE_TYPES = {
+    OutboxMessageType.BETTING_CLOSED.value,
+    OutboxMessageType.EVENT_CHANGED.value,
+}
+
+
+class OutboxRelay:
+    """
+    Фоновая публикация сообщений из outbox хранилища событий в RabbitMQ.
+    Сообщение удаляется из outbox только после успешной публикации,
+    при ошибках публикация повторяется с экспоненциальной задержкой.
+
+    Outbox шарда читается группой потребителей, поэтому каждое сообщение
+    публикует один процесс line_provider. Изменения событий дополняются
+    номером шарда shard_index: версии изменений сравнимы только в пределах
+    шарда.
+    """
+
+    def __init__(
+        self,
+        storage: EventStorageShard,
+        producer: RabbitMQProducer,
+        shard_index: int = 0,
+    ):
+        self.storage = storage
+        self.producer = producer
+        self.shard_index = shard_index
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
+        self.relay_task: Optional[asyncio.Task] = None
+
+    async def relay_batch(self) -> int:
+        """Публикует одну порцию сообщений и возвращает число опубликованных."""
+        entries = await self.storage.read_outbox(
+            self.consumer_name, settings.outbox_batch_size, settings.outbox_block_ms
+        )
+        if not entries:
+            return 0
+        skipped_ids = []
+        publish_entries = []
+        for entry_id, message in entries:
+            if message.get("type") == OutboxMessageType.EVENT_CHANGED.value:
+                if not settings.event_deltas_enabled:
+                    # изменения событий не рассылаются, сообщение только удаляется
+                    skipped_ids.append(entry_id)
+                    continue
+                message["shard"] = self.shard_index
+            publish_entries.append((entry_id, message))
+        entries = publish_entries
+        messages = [message for _, message in entries]
+        errors = await self.producer.publish_messages(
+            messages,
+            [message.get("type") in BROADCAST_MESSAGE_TYPES for message in messages],
+        )
+        published_ids = [
+            entry_id for (entry_id, _), error in zip(entries, errors) if error is None
+        ]
+        await self.storage.ack_outbox(published_ids + skipped_ids)
+        if len(published_ids) < len(entries):
+            raise RuntimeError(
+                f"Не опубликовано {len(entries) - len(published_ids)} сообщений outbox."
+            )
+        logger.debug(f"Из outbox опубликовано {len(published_ids)} сообщений.")
+        return len(published_ids)
+
+    async def run(self):
+        logger.info("Запущена публикация сообщений из outbox.")
+        delay = settings.outbox_retry_delay
+        group_ready = False
+        while True:
+            try:
+                if not group_ready:
+                    await self.storage.ensure_outbox_group()
+                    group_ready = True
+                await self.relay_batch()
+                delay = settings.outbox_retry_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка публикации outbox, повтор через {delay} с: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.outbox_retry_max_delay)
+
+    async def start(self):
+        """Запускаем фоновую задачу публикации outbox."""
+        self.relay_task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Останавливаем фоновую задачу публикации outbox."""
+        if self.relay_task:
+            self.relay_task.cancel()
+            try:
+                await self.relay_task
+            except asyncio.CancelledError:
+                pass
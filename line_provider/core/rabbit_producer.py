@@ -1,25 +1,64 @@
+import asyncio
 import json
 from typing import Optional
 
-from aio_pika import connect_robust, Message, Channel, Connection
+from aio_pika import (
+    connect_robust,
+    DeliveryMode,
+    Message,
+    Channel,
+    Connection,
+    Exchange,
+    ExchangeType,
+)
 
 from core.config import settings
 from core.logger import logger
 
 
 class RabbitMQProducer:
+    """
+    Публикация сообщений в RabbitMQ через внутреннюю очередь.
+
+    Сообщения собираются в пачки и публикуются конвейером по небольшому пулу
+    каналов с подтверждениями брокера (publisher confirms). Когда брокер не
+    успевает, внутренняя очередь заполняется и publish_message ждёт свободного
+    места, тем самым ограничивая число сообщений в памяти. Сообщения для всех
+    процессов bet_maker (broadcast) публикуются в fanout exchange, остальные -
+    в общую рабочую очередь.
+    """
+
     def __init__(self):
         self.connection: Optional[Connection] = None
-        self.channel: Optional[Channel] = None
+        self.channels: list[Channel] = []
+        self.events_exchange: Optional[Exchange] = None
+        self.publish_queue: Optional[asyncio.Queue] = None
+        self.publish_tasks: list[asyncio.Task] = []
+        self.in_flight = 0
+        self.published = 0
+        self.failed = 0
 
     async def connect(self):
-        """Установить соединение с RabbitMQ и открыть канал."""
+        """Установить соединение с RabbitMQ и открыть пул каналов публикации."""
         try:
             self.connection = await connect_robust(
                 host=settings.rabbit_host, port=settings.rabbit_port
             )
-            self.channel = await self.connection.channel()
-            await self.channel.declare_queue(settings.rabbit_queue, durable=True)
+            self.channels = [
+                await self.connection.channel(publisher_confirms=True)
+                for _ in range(settings.rabbit_publish_channels)
+            ]
+            await self.channels[0].declare_queue(settings.rabbit_queue, durable=True)
+            self.events_exchange = await self.channels[0].declare_exchange(
+                settings.rabbit_events_exchange, ExchangeType.FANOUT
+            )
+            self.publish_queue = asyncio.Queue(
+                maxsize=settings.rabbit_publish_queue_size
+            )
+            self.publish_tasks = [
+                asyncio.create_task(self._publish_worker(channel))
+                for channel in self.channels
+            ]
             logger.info(
                 "Подключение к RabbitMQ и инициализация очереди прошли успешно."
             )
@@ -27,24 +66,107 @@ class RabbitMQProducer:
             logger.error(f"Ошибка при попытке подключения к RabbitMQ: {e}")
             raise
 
-    async def publish_message(self, message: dict):
-        """Публикация сообщения в очередь."""
-        if not self.channel:
+    async def _publish_worker(self, channel: Channel):
+        """Забирает из внутренней очереди пачки сообщений и публикует их в канал."""
+        events_exchange = await channel.get_exchange(
+            settings.rabbit_events_exchange, ensure=False
+        )
+        while True:
+            batch = [await self.publish_queue.get()]
+            while (
+                len(batch) < settings.rabbit_publish_batch_size
+                and not self.publish_queue.empty()
+            ):
+                batch.append(self.publish_queue.get_nowait())
+            results = await asyncio.gather(
+                *(
+                    (
+                        events_exchange.publish(
+                            Message(body=body),
+                            routing_key="",
+                            timeout=settings.rabbit_publish_timeout,
+                        )
+                        if broadcast
+                        else channel.default_exchange.publish(
+                            Message(body=body, delivery_mode=DeliveryMode.PERSISTENT),
+                            routing_key=settings.rabbit_queue,
+                            timeout=settings.rabbit_publish_timeout,
+                        )
+                    )
+                    for body, broadcast, _ in batch
+                ),
+                return_exceptions=True,
+            )
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(None)
+
+    async def publish_message(self, message: dict, broadcast: bool = False):
+        """
+        Публикация сообщения в очередь или, если broadcast, в fanout exchange.
+        Возвращает управление после подтверждения брокером или выбрасывает
+        исключение при ошибке.
+        """
+        if not self.publish_queue:
             raise RuntimeError("Канал подключения к RabbitMQ не инициализирован.")
 
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight += 1
         try:
             message_body = json.dumps(message).encode("utf-8")
-            await self.channel.default_exchange.publish(
-                Message(body=message_body),
-                routing_key=settings.rabbit_queue,
-            )
+            await self.publish_queue.put((message_body, broadcast, future))
+            await future
+            self.published += 1
             logger.debug(f"Публикация сообщения в RabbitMQ: {message}")
         except Exception as e:
+            self.failed += 1
             logger.error(f"Ошибка при публикации сообщения в RabbitMQ: {e}")
             raise
+        finally:
+            self.in_flight -= 1
+
+    async def publish_messages(
+        self, messages: list[dict], broadcast: Optional[list[bool]] = None
+    ) -> list[Optional[Exception]]:
+        """
+        Публикация пачки сообщений без ожидания каждого подтверждения по очереди.
+        broadcast отмечает сообщения для fanout exchange. Возвращает для каждого
+        сообщения None или исключение, с которым публикация завершилась неудачей.
+        """
+        if broadcast is None:
+            broadcast = [False] * len(messages)
+        results = await asyncio.gather(
+            *(
+                self.publish_message(message, to_all)
+                for message, to_all in zip(messages, broadcast)
+            ),
+            return_exceptions=True,
+        )
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    def get_stats(self) -> dict:
+        """Счётчики публикации сообщений с момента запуска процесса."""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.publish_queue.qsize() if self.publish_queue else 0,
+            "published": self.published,
+            "failed": self.failed,
+        }
 
     async def close(self):
-        """Закрытие соединения с RabbitMQ."""
+        """Остановка публикации и закрытие соединения с RabbitMQ."""
+        for task in self.publish_tasks:
+            task.cancel()
+        await asyncio.gather(*self.publish_tasks, return_exceptions=True)
+        if self.publish_queue:
+            while not self.publish_queue.empty():
+                _, _, future = self.publish_queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Соединение с RabbitMQ закрыто."))
         if self.connection:
             await self.connection.close()
             logger.info("Закрытие соединения с RabbitMQ.")
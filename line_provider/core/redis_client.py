@@ -0,0 +1,46 @@
+from typing import Optional
+
+import aioredis
+
+from core.config import settings
+from core.logger import logger
+
+
+class RedisClient:
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or settings.redis_connect_url
+        self.pool: Optional[aioredis.BlockingConnectionPool] = None
+        self.redis: Optional[aioredis.Redis] = None
+
+    async def connect(self):
+        """Создать общий пул соединений с Redis и проверить доступность хранилища."""
+        try:
+            self.pool = aioredis.BlockingConnectionPool.from_url(
+                self.url,
+                max_connections=settings.redis_max_connections,
+                timeout=settings.redis_pool_timeout,
+                socket_timeout=settings.redis_socket_timeout,
+                socket_connect_timeout=settings.redis_socket_connect_timeout,
+                health_check_interval=settings.redis_health_check_interval,
+                # события могут храниться в бинарном формате, см. events.codecs
+                decode_responses=False,
+            )
+            self.redis = aioredis.Redis(connection_pool=self.pool)
+            await self.redis.ping()
+            logger.info("Пул соединений с Redis инициализирован.")
+        except Exception as e:
+            logger.error(f"Ошибка при попытке подключения к Redis: {e}")
+            raise
+
+    @property
+    def client(self) -> aioredis.Redis:
+        """Клиент Redis, работающий поверх общего пула соединений."""
+        if not self.redis:
+            raise RuntimeError("Пул соединений с Redis не инициализирован.")
+        return self.redis
+
+    async def close(self):
+        """Закрытие всех соединений пула."""
+        if self.pool:
+            await self.pool.disconnect()
+            logger.info("Закрытие пула соединений с Redis.")
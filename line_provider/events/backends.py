@@ -0,0 +1,26 @@
+from core.config import settings
+from core.redis_client import RedisClient
+from events.base import EventStorage
+from events.crud import RedisEventStorage
+from events.memory import InMemoryEventStorage
+from events.sharding import ShardedEventStorage
+
+
+def create_redis_clients() -> list[RedisClient]:
+    """
+    Клиенты Redis шардов, без REDIS_SHARD_URLS - единственный клиент.
+    Хранилищу в памяти процесса Redis не нужен.
+    """
+    if settings.event_storage_backend == "memory":
+        return []
+    return [RedisClient(url) for url in settings.redis_shard_urls] or [RedisClient()]
+
+
+def create_event_storage(redis_clients: list[RedisClient]) -> EventStorage:
+    """Хранилище событий, выбранное настройкой event_storage_backend."""
+    if settings.event_storage_backend == "memory":
+        return InMemoryEventStorage()
+    shards = [RedisEventStorage(redis_client) for redis_client in redis_clients]
+    if len(shards) == 1:
+        return shards[0]
+    return ShardedEventStorage(shards, settings.redis_shard_names)
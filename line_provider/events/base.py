@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+
+from core.logger import logger
+from events.enums import CoefficientUpdateResult, StatusUpdateResult
+from events.schemas import EventFilter
+
+
+class EventStorage(ABC):
+    """
+    Каталог событий. Реализации: RedisEventStorage, InMemoryEventStorage и
+    ShardedEventStorage поверх нескольких RedisEventStorage.
+    Отсутствующее событие - HTTPException 404, смена статуса уже
+    рассчитанного события - HTTPException 403.
+    """
+
+    @property
+    @abstractmethod
+    def shards(self) -> list["EventStorageShard"]:
+        """Части хранилища со своими outbox и журналом изменений."""
+
+    @abstractmethod
+    async def call_get_event(self, event_id: int) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def get_event_with_version(self, event_id: int) -> tuple[dict, Optional[int]]:
+        """Событие и версия его последнего изменения."""
+
+    @abstractmethod
+    async def get_all_events(self) -> list[dict]:
+        pass
+
+    @abstractmethod
+    async def get_events_page(
+        self, cursor: int = 0, limit: int = 0
+    ) -> tuple[int, list[dict]]:
+        """Порция событий и курсор следующей порции, 0 - конец списка."""
+
+    @abstractmethod
+    async def iter_events(self, chunk_size: int = 0) -> AsyncIterator[list[bytes]]:
+        """Порции закодированных событий, см. events.codecs."""
+
+    @abstractmethod
+    async def find_events(
+        self, filters: EventFilter, offset: int = 0, limit: Optional[int] = None
+    ) -> tuple[int, list[dict]]:
+        """События по фильтрам в порядке id и смещение следующей порции."""
+
+    @abstractmethod
+    async def add_event(self, event: dict) -> dict:
+        pass
+
+    @abstractmethod
+    async def add_events(self, events: list[dict]) -> list[dict]:
+        pass
+
+    @abstractmethod
+    async def update_event(self, event_id: int, new_status: int) -> dict:
+        """Рассчитывает событие, сообщение о расчёте попадает в outbox."""
+
+    @abstractmethod
+    async def update_events(self, updates: list[tuple[int, int]]) -> list[dict]:
+        """Результат по каждому элементу, см. status_update_result."""
+
+    @abstractmethod
+    async def update_coefficients(
+        self, updates: dict[int, tuple[float, int]]
+    ) -> dict[int, CoefficientUpdateResult]:
+        """
+        Меняет коэффициенты событий, ещё принимающих ставки. Обновление -
+        коэффициент и время его приёма в микросекундах: коэффициент, принятый
+        раньше уже записанного, не применяется.
+        """
+
+    @abstractmethod
+    async def delete_event(self, event_id: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_catalogue_version(self):
+        """Версия каталога для ETag, меняется при любом изменении событий."""
+
+    @abstractmethod
+    async def get_changes(self, since: str, limit: int) -> dict:
+        """Изменения каталога после версии since, см. GET /events/changes."""
+
+    @abstractmethod
+    async def archive_settled_events(self, settled_before: int, limit: int) -> int:
+        """Переносит в архив порцию рассчитанных событий, возвращает её размер."""
+
+    @abstractmethod
+    async def get_archived_event(self, event_id: int) -> dict:
+        pass
+
+    @abstractmethod
+    async def close_expired_betting(self, now: int, limit: int) -> int:
+        """Закрывает приём ставок на порцию событий с наступившим дедлайном."""
+
+
+class EventStorageShard(EventStorage):
+    """
+    Хранилище со своими outbox и уведомлениями об изменениях, их
+    обслуживают core.outbox_relay.OutboxRelay и
+    core.change_listener.ChangeListener.
+    """
+
+    @property
+    def shards(self) -> list["EventStorageShard"]:
+        return [self]
+
+    @abstractmethod
+    async def subscribe_changes(self):
+        """
+        Подписка на уведомления об изменениях с методами get_message и close,
+        как у pub/sub Redis. Уведомление - JSON с полями event_id, version и
+        event (новое состояние) или deleted.
+        """
+
+    @abstractmethod
+    async def ensure_outbox_group(self) -> None:
+        pass
+
+    @abstractmethod
+    async def read_outbox(
+        self, consumer: str, count: int, block_ms: int
+    ) -> list[tuple[bytes, dict]]:
+        """Порция неподтверждённых сообщений outbox в виде (id, сообщение)."""
+
+    @abstractmethod
+    async def ack_outbox(self, entry_ids: list) -> None:
+        """Удаляет опубликованные сообщения из outbox."""
+
+
+def event_not_found(event_id: int) -> HTTPException:
+    logger.error(f"Ошибка при получении события с id {event_id}, нет в системе.")
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Такого события нет в системе!",
+    )
+
+
+def status_update_result(
+    event_id: int, result: StatusUpdateResult, event: Optional[dict] = None
+) -> dict:
+    """Результат смены статуса события для клиента."""
+    if result is StatusUpdateResult.NOT_FOUND:
+        return {
+            "event_id": event_id,
+            "status_code": status.HTTP_404_NOT_FOUND,
+            "detail": "Такого события нет в системе!",
+        }
+    if result is StatusUpdateResult.INVALID_STATUS:
+        return {
+            "event_id": event_id,
+            "status_code": status.HTTP_422_UNPROCESSABLE_ENTITY,
+            "detail": "Событие можно перевести только в статус расчёта.",
+        }
+    if result is StatusUpdateResult.ALREADY_FINISHED:
+        return {
+            "event_id": event_id,
+            "status_code": status.HTTP_403_FORBIDDEN,
+            "detail": "Нельзя изменить статус уже законченного мероприятия.",
+        }
+    return {"event_id": event_id, "status_code": status.HTTP_200_OK, "event": event}
+
+
+def raise_for_status_update(result: dict) -> dict:
+    """Возвращает событие или возбуждает ошибку результата смены статуса."""
+    if result["status_code"] != status.HTTP_200_OK:
+        logger.error(
+            f"Статус события с id {result['event_id']} не изменён: {result['detail']}"
+        )
+        raise HTTPException(status_code=result["status_code"], detail=result["detail"])
+    logger.debug(f"У события с id {result['event_id']} обновлён статус.")
+    return result["event"]
@@ -0,0 +1,82 @@
+from typing import Any, Hashable, Optional
+
+from cachetools import LRUCache
+
+from core.config import settings
+from core.logger import logger
+
+
+class EventReadCache:
+    """
+    Ограниченный LRU-кэш чтения событий внутри процесса.
+
+    Кэш обслуживает запросы только пока активна подписка на канал изменений
+    (см. core.change_listener.ChangeListener), иначе процесс мог бы пропустить
+    инвалидацию от другого воркера. Запись в кэш результата, прочитанного до
+    пришедшей инвалидации, отбрасывается по счётчику поколений.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = settings.read_cache_size,
+        lists_maxsize: int = settings.read_cache_lists_size,
+    ):
+        self.events = LRUCache(maxsize=maxsize)
+        self.lists = LRUCache(maxsize=lists_maxsize)
+        self.catalogue_version: Optional[int] = None
+        self.generation = 0
+        self.active = False
+
+    def get_event(self, event_id: int) -> Optional[dict]:
+        if not self.active:
+            return None
+        return self.events.get(event_id)
+
+    def set_event(self, event_id: int, entry: dict, generation: int) -> None:
+        if self.active and generation == self.generation:
+            self.events[event_id] = entry
+
+    def get_list(self, key: Hashable) -> Optional[Any]:
+        if not self.active:
+            return None
+        return self.lists.get(key)
+
+    def set_list(self, key: Hashable, value: Any, generation: int) -> None:
+        if self.active and generation == self.generation:
+            self.lists[key] = value
+
+    def invalidate(
+        self, event_id: Optional[int] = None, version: Optional[int] = None
+    ) -> None:
+        """
+        Удаляет событие и все закэшированные списки. Без версии сбрасывает и
+        версию каталога: она будет прочитана из Redis до следующего сообщения.
+        """
+        self.generation += 1
+        if event_id is not None:
+            self.events.pop(event_id, None)
+        self.lists.clear()
+        if version is None:
+            self.catalogue_version = None
+        elif self.active:
+            self.catalogue_version = max(self.catalogue_version or 0, version)
+
+    def on_subscribed(self, version: int) -> None:
+        self.clear()
+        self.catalogue_version = version
+        self.active = True
+        logger.info("Кэш чтения событий активирован.")
+
+    def on_change(self, change: dict) -> None:
+        self.invalidate(change["event_id"], change["version"])
+
+    def on_unsubscribed(self) -> None:
+        self.active = False
+        self.clear()
+        logger.info("Кэш чтения событий отключён до восстановления подписки.")
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.events.clear()
+        self.lists.clear()
+        self.catalogue_version = None
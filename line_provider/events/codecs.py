@@ -0,0 +1,46 @@
+"""
+Кодирование событий для хранения в Redis.
+
+Поддерживаются форматы JSON и MessagePack. Формат новых записей задаётся
+настройкой event_storage_format, а чтение определяет формат по первому байту,
+поэтому оба формата могут сосуществовать во время онлайн-миграции.
+"""
+
+import json
+
+import msgpack
+
+from core.config import settings
+
+JSON = "json"
+MSGPACK = "msgpack"
+FORMATS = (JSON, MSGPACK)
+
+
+def is_json(data: bytes) -> bool:
+    return data[:1] == b"{"
+
+
+def detect_format(data: bytes) -> str:
+    return JSON if is_json(data) else MSGPACK
+
+
+def encode_event(
+    event: dict, storage_format: str = settings.event_storage_format
+) -> bytes:
+    if storage_format == MSGPACK:
+        return msgpack.packb(event)
+    return json.dumps(event, separators=(",", ":")).encode("utf-8")
+
+
+def decode_event(data: bytes) -> dict:
+    if is_json(data):
+        return json.loads(data)
+    return msgpack.unpackb(data)
+
+
+def to_json_bytes(data: bytes) -> bytes:
+    """Возвращает событие в JSON, не перекодируя данные, уже хранящиеся в JSON."""
+    if is_json(data):
+        return data
+    return json.dumps(msgpack.unpackb(data), separators=(",", ":")).encode("utf-8")
@@ -1,112 +1,906 @@
 import json
 import time
 from functools import wraps
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 import aioredis
 from fastapi import HTTPException, status
 
 from core.config import settings
 from core.logger import logger
-from events.enums import EventState
+from core.redis_client import RedisClient
+from events import scripts
+from events.base import (
+    EventStorageShard,
+    event_not_found,
+    raise_for_status_update,
+    status_update_result,
+)
+from events.cache import EventReadCache
+from events.codecs import decode_event, detect_format, encode_event
+from events.enums import (
+    CoefficientUpdateResult,
+    EventState,
+    OutboxMessageType,
+    StatusUpdateResult,
+)
+from events.schemas import EventFilter
+
+# Курсор порции событий: курсор HSCAN * PAGE_CURSOR_ID_SPAN + id последнего
+# отданного события этого шага HSCAN, см. RedisEventStorage.get_events_page.
+PAGE_CURSOR_ID_SPAN = 2**40
 
 
 def with_redis_connection(method):
+    """Передаёт в метод клиент общего пула соединений с Redis."""
+
     @wraps(method)
     async def wrapper(self, *args, **kwargs):
-        redis = await aioredis.from_url(
-            settings.redis_connect_url, decode_responses=True
-        )
         try:
-            logger.debug("Открылось подключение к редису.")
-            return await method(self, redis, *args, **kwargs)
-        except aioredis.exceptions.ConnectionError as e:
+            return await method(self, self.redis_client.client, *args, **kwargs)
+        except (
+            aioredis.exceptions.ConnectionError,
+            aioredis.exceptions.TimeoutError,
+        ) as e:
             logger.error(f"Не удалось подключиться к Redis: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Не удалось подключиться к хранилищу Redis.",
             )
-        finally:
-            await redis.close()
-            logger.debug("Закрыли подключение.")
 
     return wrapper
 
 
-class RedisEventStorage:
+class RedisEventStorage(EventStorageShard):
     def __init__(
         self,
+        redis_client: RedisClient,
         redis_hash_name: str = "events",
         max_id_key: str = "max_event_id",
     ):
+        self.redis_client = redis_client
         self.redis_hash_name = redis_hash_name
         self.max_id_key = max_id_key
+        self.deadline_index = f"{redis_hash_name}:idx:deadline"
+        self.coefficient_index = f"{redis_hash_name}:idx:coefficient"
+        self.coefficient_submitted = f"{redis_hash_name}:coefficient:submitted"
+        self.outbox_stream = f"{redis_hash_name}:outbox"
+        self.version_key = f"{redis_hash_name}:version"
+        self.changes_index = f"{redis_hash_name}:changes"
+        self.changes_deleted_index = f"{redis_hash_name}:changes:deleted"
+        self.changes_min_version_key = f"{redis_hash_name}:changes:min_version"
+        self.settled_index = f"{redis_hash_name}:idx:settled"
+        self.open_index = f"{redis_hash_name}:idx:open"
+        self.archive_prefix = f"{redis_hash_name}:archive"
+        self._scripts = {}
+        self.read_cache = EventReadCache()
+
+    def _state_index(self, state: int) -> str:
+        return f"{self.redis_hash_name}:idx:state:{int(state)}"
 
-    async def _get_next_event_id(self, redis) -> int:
-        max_id = await redis.get(self.max_id_key)
-        if not max_id:
-            max_id = 1
-            await redis.set(self.max_id_key, max_id)
-            logger.debug("Установлен первичный id.")
-            return max_id
+    def _index_event(self, pipe, event: dict) -> None:
+        """Добавляет в пайплайн команды записи события во все вторичные индексы."""
+        event_id = event["event_id"]
+        pipe.zadd(self.deadline_index, {event_id: event["deadline"]})
+        if event.get("coefficient") is not None:
+            pipe.zadd(self.coefficient_index, {event_id: event["coefficient"]})
+        for state in EventState:
+            if state.value != event["state"]:
+                pipe.srem(self._state_index(state), event_id)
+        pipe.sadd(self._state_index(event["state"]), event_id)
+        if event["state"] != EventState.NEW.value:
+            pipe.zadd(self.settled_index, {event_id: event["update_date"]}, nx=True)
+        if event["state"] == EventState.NEW.value and event["deadline"] > time.time():
+            pipe.zadd(self.open_index, {event_id: event["deadline"]})
         else:
-            max_id = int(max_id)
+            pipe.zrem(self.open_index, event_id)
 
-        next_id = max_id + 1
-        await redis.set(self.max_id_key, next_id)
-        return next_id
+    def _script(self, redis, source: str):
+        """Возвращает зарегистрированный Lua-скрипт, вызываемый через EVALSHA."""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = redis.register_script(source)
+        return script
 
-    async def _get_event(self, redis, event_id: int) -> Optional[dict]:
-        event_data = await redis.hget(self.redis_hash_name, event_id)
+    async def _get_event(self, redis, event_id: int) -> dict:
+        """
+        Возвращает событие вместе с версией его последнего изменения,
+        при промахе читает обе записи из Redis одной транзакцией.
+        """
+        entry = self.read_cache.get_event(event_id)
+        if entry is not None:
+            return entry
+        generation = self.read_cache.generation
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hget(self.redis_hash_name, event_id)
+            pipe.zscore(self.changes_index, event_id)
+            event_data, version = await pipe.execute()
         if not event_data:
-            logger.error(
-                f"Ошибка при получении события с id {event_id}, нет в системе."
-            )
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Такого события нет в системе!",
-            )
-        return json.loads(event_data)
+            raise event_not_found(event_id)
+        entry = {
+            "event": decode_event(event_data),
+            "version": None if version is None else int(version),
+        }
+        self.read_cache.set_event(event_id, entry, generation)
+        return entry
+
+    async def _cached_list(self, key, load):
+        """Возвращает результат списочного запроса из кэша чтения или load()."""
+        result = self.read_cache.get_list(key)
+        if result is not None:
+            return result
+        generation = self.read_cache.generation
+        result = await load()
+        self.read_cache.set_list(key, result, generation)
+        return result
 
     @with_redis_connection
     async def call_get_event(self, redis, event_id) -> Optional[dict]:
         logger.debug(f"Попытка получения события с id {event_id}.")
-        return await self._get_event(redis, event_id)
+        return (await self._get_event(redis, event_id))["event"]
 
     @with_redis_connection
     async def get_all_events(self, redis):
-        events_data = await redis.hgetall(self.redis_hash_name)
-        events = [json.loads(event) for event in events_data.values()]
+        return await self._cached_list(("all",), lambda: self._scan_all_events(redis))
+
+    async def _scan_all_events(self, redis) -> list[dict]:
+        # HSCAN порциями вместо HGETALL, чтобы не блокировать Redis на большом хэше.
+        events = []
+        cursor = 0
+        while True:
+            cursor, events_data = await redis.hscan(
+                self.redis_hash_name, cursor=cursor, count=settings.events_page_size
+            )
+            events.extend(decode_event(event) for event in events_data.values())
+            if cursor == 0:
+                break
         logger.debug("Получен список событий.")
         return events
 
     @with_redis_connection
-    async def add_event(self, redis, event: dict) -> dict:
-        event_id = await self._get_next_event_id(redis)
-        event["event_id"] = event_id
-        event["create_date"] = int(time.time())
-        event["update_date"] = int(time.time())
+    async def get_events_page(
+        self, redis, cursor: int = 0, limit: int = settings.events_page_size
+    ) -> tuple[int, list[dict]]:
+        """
+        Возвращает одну порцию не больше limit событий и курсор следующей
+        порции. Курсор 0 в ответе означает, что события закончились.
+        """
+        return await self._cached_list(
+            ("page", cursor, limit),
+            lambda: self._scan_events_page(redis, cursor, limit),
+        )
+
+    async def _scan_events_page(
+        self, redis, cursor: int, limit: int
+    ) -> tuple[int, list[dict]]:
+        # COUNT для HSCAN лишь подсказка: небольшой хэш отдаётся целиком, а
+        # большой - порциями больше COUNT. Лишние события шага HSCAN не
+        # отдаются, курсор порции запоминает шаг и id последнего отданного
+        # события, следующий запрос повторяет шаг и продолжает после этого id.
+        scan_cursor, last_id = divmod(cursor, PAGE_CURSOR_ID_SPAN)
+        events = []
+        while True:
+            next_cursor, events_data = await redis.hscan(
+                self.redis_hash_name, cursor=scan_cursor, count=limit
+            )
+            batch = sorted(
+                (int(event_id), data)
+                for event_id, data in events_data.items()
+                if int(event_id) > last_id
+            )
+            room = limit - len(events)
+            if len(batch) > room:
+                events.extend(decode_event(data) for _, data in batch[:room])
+                next_page = scan_cursor * PAGE_CURSOR_ID_SPAN + batch[room - 1][0]
+                break
+            events.extend(decode_event(data) for _, data in batch)
+            if next_cursor == 0:
+                next_page = 0
+                break
+            next_page = next_cursor * PAGE_CURSOR_ID_SPAN
+            if len(events) == limit:
+                break
+            scan_cursor, last_id = next_cursor, 0
+        logger.debug(f"Получена порция событий по курсору {cursor}.")
+        return next_page, events
+
+    async def iter_events(
+        self, chunk_size: int = settings.events_page_size
+    ) -> AsyncIterator[list[bytes]]:
+        """
+        Асинхронно отдаёт закодированные события порциями HSCAN,
+        не накапливая весь хэш в памяти процесса.
+        """
+        redis = self.redis_client.client
+        cursor = 0
+        while True:
+            cursor, events_data = await redis.hscan(
+                self.redis_hash_name, cursor=cursor, count=chunk_size
+            )
+            yield list(events_data.values())
+            if cursor == 0:
+                break
+
+    def _create_event_keys(self) -> list[str]:
+        return [
+            self.redis_hash_name,
+            self.max_id_key,
+            self.deadline_index,
+            self.coefficient_index,
+            self._state_index(EventState.NEW),
+            self.version_key,
+            self.changes_index,
+            self.open_index,
+            self.outbox_stream,
+        ]
+
+    @staticmethod
+    def _prepare_new_event(event: dict) -> bytes:
+        """Проставляет служебные поля нового события и кодирует его для скрипта."""
+        now = int(time.time())
+        event["create_date"] = now
+        event["update_date"] = now
         event["state"] = EventState.NEW.value
-        await redis.hset(self.redis_hash_name, event_id, json.dumps(event))
+        return encode_event(event)
+
+    def _create_event_args(self, event: dict, event_id: Optional[int]) -> list:
+        args = [self._prepare_new_event(event), settings.event_storage_format]
+        if event_id is not None:
+            args.append(event_id)
+        return args
+
+    @with_redis_connection
+    async def allocate_event_ids(self, redis, count: int) -> list[int]:
+        """Выделяет id для событий, которые будут записаны на другие шарды."""
+        last_id = await redis.incrby(self.max_id_key, count)
+        return list(range(last_id - count + 1, last_id + 1))
+
+    @with_redis_connection
+    async def add_event(
+        self, redis, event: dict, event_id: Optional[int] = None
+    ) -> dict:
+        # Выделение id и запись события выполняются атомарно одним скриптом,
+        # поэтому параллельные воркеры не могут получить одинаковый id.
+        event_id = await self._script(redis, scripts.CREATE_EVENT)(
+            keys=self._create_event_keys(),
+            args=self._create_event_args(event, event_id),
+            client=redis,
+        )
+        event["event_id"] = int(event_id)
+        self.read_cache.invalidate()
         logger.debug("Сохранёно новое событие.")
         return event
 
+    @with_redis_connection
+    async def add_events(
+        self, redis, events: list[dict], event_ids: Optional[list[int]] = None
+    ) -> list[dict]:
+        """
+        Создаёт пачку событий одним пайплайном скриптов создания.
+        Заранее выделенные id передаются в event_ids.
+        """
+        create_event = self._script(redis, scripts.CREATE_EVENT)
+        async with redis.pipeline(transaction=False) as pipe:
+            for event, event_id in zip(events, event_ids or [None] * len(events)):
+                await create_event(
+                    keys=self._create_event_keys(),
+                    args=self._create_event_args(event, event_id),
+                    client=pipe,
+                )
+            event_ids = await pipe.execute()
+        for event, event_id in zip(events, event_ids):
+            event["event_id"] = int(event_id)
+        self.read_cache.invalidate()
+        logger.debug(f"Сохранено {len(events)} новых событий.")
+        return events
+
+    async def _call_update_status(self, redis, client, event_id: int, new_status: int):
+        """Вызывает скрипт атомарной смены статуса на клиенте или в пайплайне."""
+        return await self._script(redis, scripts.UPDATE_EVENT_STATUS)(
+            keys=[
+                self.redis_hash_name,
+                self._state_index(EventState.NEW),
+                self._state_index(new_status),
+                self.outbox_stream,
+                self.version_key,
+                self.changes_index,
+                self.settled_index,
+                self.open_index,
+            ],
+            args=[
+                event_id,
+                int(new_status),
+                int(time.time()),
+                settings.event_storage_format,
+                EventState.NEW.value,
+            ],
+            client=client,
+        )
+
+    @staticmethod
+    def _status_update_result(event_id: int, reply: list) -> dict:
+        """Преобразует ответ скрипта смены статуса в результат для клиента."""
+        result = StatusUpdateResult(reply[0])
+        event = decode_event(reply[1]) if len(reply) > 1 else None
+        return status_update_result(event_id, result, event)
+
     @with_redis_connection
     async def update_event(self, redis, event_id: int, new_status: int) -> dict:
-        event = await self._get_event(redis, event_id=event_id)
-        if event["state"] != EventState.NEW.value:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Нельзя изменить статус уже законченного мероприятия.",
-            )
-        event["state"] = new_status
-        event["update_date"] = int(time.time())
-        await redis.hset(self.redis_hash_name, event_id, json.dumps(event))
-        logger.debug(f"У события с id {event_id} обновлён статус.")
-        return event
+        # Проверка статуса и запись выполняются одним скриптом, поэтому две
+        # конкурирующие попытки рассчитать событие не могут пройти обе.
+        reply = await self._call_update_status(redis, redis, event_id, new_status)
+        self.read_cache.invalidate(event_id)
+        return raise_for_status_update(self._status_update_result(event_id, reply))
+
+    @with_redis_connection
+    async def update_events(self, redis, updates: list[tuple[int, int]]) -> list[dict]:
+        """
+        Обновляет статусы пачки событий одним пайплайном скриптов атомарной
+        смены статуса. Для каждого элемента возвращает код результата,
+        описание ошибки и обновлённое событие.
+        """
+        async with redis.pipeline(transaction=False) as pipe:
+            for event_id, new_status in updates:
+                await self._call_update_status(redis, pipe, event_id, new_status)
+            replies = await pipe.execute()
+        for event_id, _ in updates:
+            self.read_cache.invalidate(event_id)
+        results = [
+            self._status_update_result(event_id, reply)
+            for (event_id, _), reply in zip(updates, replies)
+        ]
+        logger.debug(f"Обработано {len(results)} изменений статуса событий.")
+        return results
+
+    @with_redis_connection
+    async def update_coefficients(
+        self, redis, updates: dict[int, tuple[float, int]]
+    ) -> dict[int, CoefficientUpdateResult]:
+        """Записывает новые коэффициенты событий одним пайплайном скриптов."""
+        set_coefficient = self._script(redis, scripts.SET_COEFFICIENT)
+        now = int(time.time())
+        async with redis.pipeline(transaction=False) as pipe:
+            for event_id, (coefficient, submitted_at) in updates.items():
+                await set_coefficient(
+                    keys=[
+                        self.redis_hash_name,
+                        self.coefficient_index,
+                        self.version_key,
+                        self.changes_index,
+                        self.coefficient_submitted,
+                        self.open_index,
+                        self.outbox_stream,
+                    ],
+                    args=[
+                        event_id,
+                        coefficient,
+                        now,
+                        settings.event_storage_format,
+                        EventState.NEW.value,
+                        submitted_at,
+                    ],
+                    client=pipe,
+                )
+            replies = await pipe.execute()
+        results = {}
+        for event_id, reply in zip(updates, replies):
+            results[event_id] = CoefficientUpdateResult(reply)
+            if results[event_id] is CoefficientUpdateResult.UPDATED:
+                self.read_cache.invalidate(event_id)
+        logger.debug(f"Записаны коэффициенты {len(updates)} событий.")
+        return results
 
     @with_redis_connection
     async def delete_event(self, redis, event_id: int):
-        result = await redis.hdel(self.redis_hash_name, event_id)
+        result = await self._script(redis, scripts.DELETE_EVENT)(
+            keys=[
+                self.redis_hash_name,
+                self.deadline_index,
+                self.coefficient_index,
+                self.settled_index,
+                self.version_key,
+                self.changes_index,
+                self.open_index,
+                self.outbox_stream,
+                self.changes_deleted_index,
+                self.changes_min_version_key,
+                *(self._state_index(state) for state in EventState),
+            ],
+            args=[event_id, settings.changes_tombstone_retention],
+            client=redis,
+        )
+        await redis.hdel(self.coefficient_submitted, event_id)
+        self.read_cache.invalidate(event_id)
         logger.debug(f"События с id {event_id} удалено из системы.")
         return result > 0
+
+    @with_redis_connection
+    async def find_events(
+        self,
+        redis,
+        filters: EventFilter,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> tuple[int, list[dict]]:
+        """
+        Отбирает события по вторичным индексам без просмотра всего хэша.
+        Возвращает смещение следующей порции (0 - порций больше нет) и события.
+        Без limit возвращаются все подходящие события начиная с offset.
+        """
+        return await self._cached_list(
+            ("find", tuple(filters.model_dump().items()), offset, limit),
+            lambda: self._find_events(redis, filters, offset, limit),
+        )
+
+    async def _find_events(
+        self, redis, filters: EventFilter, offset: int, limit: Optional[int]
+    ) -> tuple[int, list[dict]]:
+        async with redis.pipeline(transaction=False) as pipe:
+            if filters.state is not None:
+                pipe.smembers(self._state_index(filters.state))
+            if (
+                filters.deadline_after is not None
+                or filters.deadline_before is not None
+            ):
+                pipe.zrangebyscore(
+                    self.deadline_index,
+                    _exclusive_bound(filters.deadline_after, "-inf"),
+                    _exclusive_bound(filters.deadline_before, "+inf"),
+                )
+            if (
+                filters.coefficient_min is not None
+                or filters.coefficient_max is not None
+            ):
+                pipe.zrangebyscore(
+                    self.coefficient_index,
+                    _inclusive_bound(filters.coefficient_min, "-inf"),
+                    _inclusive_bound(filters.coefficient_max, "+inf"),
+                )
+            results = await pipe.execute()
+
+        matched_ids = sorted(
+            set.intersection(*({int(event_id) for event_id in r} for r in results))
+        )
+        if limit is None:
+            limit = len(matched_ids)
+        page_ids = matched_ids[offset : offset + limit]
+        events_data = (
+            await redis.hmget(self.redis_hash_name, page_ids) if page_ids else []
+        )
+        events = [decode_event(event) for event in events_data if event]
+        next_offset = offset + limit if offset + limit < len(matched_ids) else 0
+        logger.debug(f"По фильтрам найдено {len(matched_ids)} событий.")
+        return next_offset, events
+
+    @with_redis_connection
+    async def rebuild_indexes(self, redis) -> int:
+        """
+        Заново индексирует все события хэша. Операция идемпотентна и может
+        выполняться на работающей системе, например для данных, созданных
+        до появления индексов. События, которых нет в журнале изменений,
+        добавляются в него с новой версией каталога.
+        """
+        indexed = 0
+        cursor = 0
+        while True:
+            cursor, events_data = await redis.hscan(
+                self.redis_hash_name, cursor=cursor, count=settings.events_page_size
+            )
+            # у каждого события своя версия: журнал читается порциями после
+            # версии since, и события одной версии разрывать нельзя
+            if events_data:
+                last_version = await redis.incrby(self.version_key, len(events_data))
+                first_version = last_version - len(events_data) + 1
+            async with redis.pipeline(transaction=False) as pipe:
+                for event in events_data.values():
+                    self._index_event(pipe, decode_event(event))
+                if events_data:
+                    pipe.zadd(
+                        self.changes_index,
+                        {
+                            event_id: first_version + offset
+                            for offset, event_id in enumerate(events_data)
+                        },
+                        nx=True,
+                    )
+                await pipe.execute()
+            indexed += len(events_data)
+            if cursor == 0:
+                break
+        logger.info(f"Индексы перестроены для {indexed} событий.")
+        return indexed
+
+    @with_redis_connection
+    async def archive_settled_events(
+        self, redis, settled_before: int, limit: int
+    ) -> int:
+        """
+        Переносит рассчитанные не позже settled_before события из рабочего
+        хэша в архив. Повторный или параллельный вызов безопасен: скрипт
+        заново проверяет каждое событие. Возвращает число перенесённых событий.
+        """
+        event_ids = await redis.zrangebyscore(
+            self.settled_index, "-inf", settled_before, start=0, num=limit
+        )
+        if not event_ids:
+            return 0
+        states = [self._state_index(state) for state in EventState]
+        archived = await self._script(redis, scripts.ARCHIVE_EVENTS)(
+            keys=[
+                self.redis_hash_name,
+                self.settled_index,
+                self.deadline_index,
+                self.coefficient_index,
+                self.version_key,
+                self.changes_index,
+                self.outbox_stream,
+                self.changes_deleted_index,
+                self.changes_min_version_key,
+                *states,
+                *(self._archive_key(int(event_id)) for event_id in event_ids),
+            ],
+            args=[
+                settled_before,
+                settings.archive_ttl,
+                len(states),
+                EventState.NEW.value,
+                settings.changes_tombstone_retention,
+                *event_ids,
+            ],
+            client=redis,
+        )
+        # коэффициенты рассчитанных событий больше не меняются
+        await redis.hdel(self.coefficient_submitted, *event_ids)
+        for event_id in event_ids:
+            self.read_cache.invalidate(int(event_id))
+        logger.debug(f"В архив перенесено {archived} рассчитанных событий.")
+        return archived
+
+    def _archive_key(self, event_id: int) -> str:
+        return f"{self.archive_prefix}:{event_id}"
+
+    @with_redis_connection
+    async def get_archived_event(self, redis, event_id: int) -> dict:
+        event_data = await redis.get(self._archive_key(event_id))
+        if not event_data:
+            logger.error(f"События с id {event_id} нет в архиве.")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Такого события нет в архиве!",
+            )
+        return decode_event(event_data)
+
+    @with_redis_connection
+    async def get_catalogue_version(self, redis) -> int:
+        """Текущая версия каталога, увеличивается при любом изменении событий."""
+        if self.read_cache.catalogue_version is not None:
+            return self.read_cache.catalogue_version
+        return int(await redis.get(self.version_key) or 0)
+
+    @with_redis_connection
+    async def get_event_with_version(
+        self, redis, event_id: int
+    ) -> tuple[dict, Optional[int]]:
+        """
+        Событие и версия его последнего изменения (None, если её нет в
+        журнале). Для отсутствующего события возбуждает 404.
+        """
+        entry = await self._get_event(redis, event_id)
+        return entry["event"], entry["version"]
+
+    @with_redis_connection
+    async def subscribe_changes(self, redis):
+        """Возвращает подписку на канал уведомлений об изменениях событий."""
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(self.changes_index)
+        return pubsub
+
+    @with_redis_connection
+    async def get_changes(self, redis, since: str, limit: int) -> dict:
+        """
+        Возвращает события, изменённые после версии since, и id удалённых
+        событий. Версия в ответе используется как since следующего запроса.
+        """
+        since, watermark = parse_changes_since(since)
+        # Версия читается до журнала: изменение между командами попадёт в
+        # журнал и будет отдано повторно, но не будет потеряно.
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(self.version_key)
+            pipe.get(self.changes_min_version_key)
+            pipe.zrangebyscore(
+                self.changes_index,
+                f"({since}",
+                "+inf",
+                start=0,
+                num=limit,
+                withscores=True,
+            )
+            current_version, min_version, changes = await pipe.execute()
+        min_version = int(min_version or 0)
+        watermark = changes_watermark(
+            since, watermark, int(current_version or 0), min_version
+        )
+        event_ids = [int(event_id) for event_id, _ in changes]
+        events_data = (
+            await redis.hmget(self.redis_hash_name, event_ids) if event_ids else []
+        )
+        events, deleted = [], []
+        for event_id, event_data in zip(event_ids, events_data):
+            if event_data:
+                events.append(decode_event(event_data))
+            elif since:
+                # при полной синхронизации удаления клиенту не нужны
+                deleted.append(event_id)
+        has_more = len(changes) == limit
+        last_version = int(changes[-1][1]) if changes else 0
+        version = (
+            last_version if has_more else max(int(current_version or 0), last_version)
+        )
+        logger.debug(f"С версии {since} изменилось {len(event_ids)} событий.")
+        return {
+            "version": changes_version(version, has_more, watermark),
+            "has_more": has_more,
+            "events": events,
+            "deleted": deleted,
+            "min_version": str(min_version),
+        }
+
+    @with_redis_connection
+    async def migrate_format(
+        self, redis, storage_format: str = settings.event_storage_format
+    ) -> int:
+        """
+        Перекодирует хранящиеся события в указанный формат. Каждое событие
+        перезаписывается скриптом только если оно не изменилось с момента чтения,
+        поэтому миграцию можно выполнять на работающей системе.
+        """
+        migrate_event = self._script(redis, scripts.MIGRATE_EVENT)
+        migrated = 0
+        cursor = 0
+        while True:
+            cursor, events_data = await redis.hscan(
+                self.redis_hash_name, cursor=cursor, count=settings.events_page_size
+            )
+            async with redis.pipeline(transaction=False) as pipe:
+                for event_id, event_data in events_data.items():
+                    if detect_format(event_data) == storage_format:
+                        continue
+                    await migrate_event(
+                        keys=[self.redis_hash_name],
+                        args=[
+                            event_id,
+                            event_data,
+                            encode_event(decode_event(event_data), storage_format),
+                        ],
+                        client=pipe,
+                    )
+                results = await pipe.execute()
+            migrated += sum(results)
+            if cursor == 0:
+                break
+        logger.info(f"В формат {storage_format} перекодировано {migrated} событий.")
+        return migrated
+
+    @with_redis_connection
+    async def ensure_outbox_group(self, redis) -> None:
+        """Создаёт поток outbox и группу потребителей, если их ещё нет."""
+        try:
+            await redis.xgroup_create(
+                self.outbox_stream, settings.outbox_group, id="0", mkstream=True
+            )
+        except aioredis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @with_redis_connection
+    async def read_outbox(
+        self, redis, consumer: str, count: int, block_ms: int
+    ) -> list[tuple[bytes, dict]]:
+        """
+        Возвращает порцию сообщений outbox для публикации. Сначала повторно
+        отдаются неподтверждённые сообщения этого потребителя, затем
+        зависшие сообщения других потребителей, и только потом новые.
+        """
+        entries = await self._read_outbox_group(redis, consumer, "0", count)
+        if not entries:
+            entries = await self._claim_stale_outbox(redis, consumer, count)
+        if not entries:
+            entries = await self._read_outbox_group(
+                redis, consumer, ">", count, block_ms
+            )
+        return [
+            (entry_id, json.loads(fields[b"message"])) for entry_id, fields in entries
+        ]
+
+    async def _read_outbox_group(
+        self, redis, consumer: str, stream_id: str, count: int, block_ms=None
+    ) -> list:
+        response = await redis.xreadgroup(
+            settings.outbox_group,
+            consumer,
+            {self.outbox_stream: stream_id},
+            count=count,
+            block=block_ms,
+        )
+        return response[0][1] if response else []
+
+    async def _claim_stale_outbox(self, redis, consumer: str, count: int) -> list:
+        """Забирает сообщения, зависшие у остановившихся потребителей."""
+        pending = await redis.xpending_range(
+            self.outbox_stream, settings.outbox_group, "-", "+", count
+        )
+        stale_ids = [
+            entry["message_id"]
+            for entry in pending
+            if entry["time_since_delivered"] >= settings.outbox_claim_idle_ms
+        ]
+        if not stale_ids:
+            return []
+        logger.info(f"Перехвачено {len(stale_ids)} зависших сообщений outbox.")
+        return await redis.xclaim(
+            self.outbox_stream,
+            settings.outbox_group,
+            consumer,
+            settings.outbox_claim_idle_ms,
+            stale_ids,
+        )
+
+    @with_redis_connection
+    async def ack_outbox(self, redis, entry_ids: list[bytes]) -> None:
+        """Подтверждает опубликованные сообщения и удаляет их из потока."""
+        if not entry_ids:
+            return
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.outbox_stream, settings.outbox_group, *entry_ids)
+            pipe.xdel(self.outbox_stream, *entry_ids)
+            await pipe.execute()
+
+    @with_redis_connection
+    async def close_expired_betting(self, redis, now: int, limit: int) -> int:
+        """
+        Закрывает приём ставок на порцию событий с наступившим дедлайном и
+        публикует о них сообщения через outbox. Возвращает размер порции.
+        """
+        closed = await self._script(redis, scripts.CLOSE_BETTING)(
+            keys=[self.open_index, self.redis_hash_name, self.outbox_stream],
+            args=[now, limit, OutboxMessageType.BETTING_CLOSED.value],
+            client=redis,
+        )
+        if closed:
+            logger.debug(f"Закрыт приём ставок на {closed} событий.")
+        return closed
+
+    @with_redis_connection
+    async def import_events(self, redis, events: list[bytes]) -> None:
+        """Записывает перенесённые с другого шарда события вместе с индексами."""
+        import_event = self._script(redis, scripts.IMPORT_EVENT)
+        async with redis.pipeline(transaction=True) as pipe:
+            for event_data in events:
+                event = decode_event(event_data)
+                await import_event(
+                    keys=[
+                        self.redis_hash_name,
+                        self.version_key,
+                        self.changes_index,
+                        self.outbox_stream,
+                    ],
+                    args=[event["event_id"], event_data],
+                    client=pipe,
+                )
+                self._index_event(pipe, event)
+            await pipe.execute()
+
+    @with_redis_connection
+    async def forget_events(self, redis, event_ids: list[int]) -> int:
+        """Убирает перенесённые на другой шард события, см. FORGET_EVENTS."""
+        forgotten = await self._script(redis, scripts.FORGET_EVENTS)(
+            keys=[
+                self.redis_hash_name,
+                self.deadline_index,
+                self.coefficient_index,
+                self.settled_index,
+                self.version_key,
+                self.changes_index,
+                self.open_index,
+                *(self._state_index(state) for state in EventState),
+            ],
+            args=event_ids,
+            client=redis,
+        )
+        await redis.hdel(self.coefficient_submitted, *event_ids)
+        for event_id in event_ids:
+            self.read_cache.invalidate(event_id)
+        return forgotten
+
+    async def iter_archived_events(
+        self, chunk_size: int = settings.archive_batch_size
+    ) -> AsyncIterator[list[tuple[int, bytes, int]]]:
+        """
+        Отдаёт архивные события порциями в виде (id, событие, оставшийся
+        срок хранения в миллисекундах или -1).
+        """
+        redis = self.redis_client.client
+        cursor = 0
+        while True:
+            cursor, keys = await redis.scan(
+                cursor, match=f"{self.archive_prefix}:*", count=chunk_size
+            )
+            if keys:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.get(key)
+                        pipe.pttl(key)
+                    replies = await pipe.execute()
+                yield [
+                    (int(key.rsplit(b":", 1)[1]), event_data, ttl)
+                    for key, event_data, ttl in zip(keys, replies[::2], replies[1::2])
+                    if event_data
+                ]
+            if cursor == 0:
+                break
+
+    @with_redis_connection
+    async def import_archived_events(
+        self, redis, events: list[tuple[int, bytes, int]]
+    ) -> None:
+        async with redis.pipeline(transaction=False) as pipe:
+            for event_id, event_data, ttl in events:
+                pipe.set(
+                    self._archive_key(event_id), event_data, px=ttl if ttl > 0 else None
+                )
+            await pipe.execute()
+
+    @with_redis_connection
+    async def forget_archived_events(self, redis, event_ids: list[int]) -> None:
+        await redis.delete(*(self._archive_key(event_id) for event_id in event_ids))
+
+
+def parse_changes_since(since: str) -> tuple[int, Optional[int]]:
+    """
+    Разбирает since ленты изменений шарда: версию и, если передана через
+    двоеточие, версию каталога на начало обхода, см. changes_watermark.
+    """
+    version, _, watermark = since.partition(":")
+    try:
+        return int(version), int(watermark) if watermark else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректная версия каталога.",
+        )
+
+
+def changes_watermark(
+    since: int, watermark: Optional[int], current_version: int, min_version: int
+) -> int:
+    """
+    Версия каталога, с которой клиент знает состояние событий: для since=0 -
+    текущая, далее - переданная в since. Порции обхода по журналу идут с
+    низких версий давно не менявшихся событий, поэтому продолжение обхода
+    несёт версию его начала. Если удаления после неё уже убраны из журнала,
+    клиент мог их пропустить: отвечаем 410.
+    """
+    if watermark is None:
+        watermark = since or current_version
+    if watermark < min_version:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=(
+                f"Журнал изменений хранит удаления с версии {min_version}, "
+                "нужна полная синхронизация с since=0."
+            ),
+        )
+    return watermark
+
+
+def changes_version(version: int, has_more: bool, watermark: int) -> str:
+    """Версия ответа ленты изменений, продолжение обхода несёт его начало."""
+    return f"{version}:{watermark}" if has_more else str(version)
+
+
+def _exclusive_bound(value, default: str) -> str:
+    return default if value is None else f"({value}"
+
+
+def _inclusive_bound(value, default: str) -> str:
+    return default if value is None else str(value)
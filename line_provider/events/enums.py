@@ -5,3 +5,38 @@ class EventState(int, enum.Enum):
     NEW = 1
     FINISHED_WIN = 2
     FINISHED_LOSE = 3
+
+
+class StatusUpdateResult(int, enum.Enum):
+    """Результат атомарной смены статуса события на стороне Redis."""
+
+    NOT_FOUND = 0
+    ALREADY_FINISHED = 1
+    UPDATED = 2
+    # статус NEW не является результатом расчёта события
+    INVALID_STATUS = 3
+
+
+class OutboxMessageType(str, enum.Enum):
+    """
+    Тип сообщения outbox. Сообщения о смене статуса публикуются без поля type,
+    как и до появления других типов.
+    """
+
+    STATUS_CHANGED = "status_changed"
+    BETTING_CLOSED = "betting_closed"
+    # изменение события для локальных кэшей bet_maker, см. events.scripts
+    EVENT_CHANGED = "event_changed"
+
+
+class CoefficientUpdateResult(int, enum.Enum):
+    """Результат записи коэффициента события на стороне Redis."""
+
+    NOT_FOUND = 0
+    EVENT_FINISHED = 1
+    UPDATED = 2
+    UNCHANGED = 3
+    # уже записан коэффициент, принятый позже этого
+    OUTDATED = 4
+    # дедлайн события наступил, приём ставок закрыт
+    BETTING_CLOSED = 5
@@ -0,0 +1,429 @@
+import asyncio
+import bisect
+import heapq
+import itertools
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.logger import logger
+from events.base import (
+    EventStorageShard,
+    event_not_found,
+    raise_for_status_update,
+    status_update_result,
+)
+from events.codecs import JSON, encode_event
+from events.crud import changes_version, changes_watermark, parse_changes_since
+from events.enums import (
+    CoefficientUpdateResult,
+    EventState,
+    OutboxMessageType,
+    StatusUpdateResult,
+)
+from events.schemas import EventFilter
+
+
+class LocalSubscription:
+    """Подписка на уведомления InMemoryEventStorage с интерфейсом pub/sub Redis."""
+
+    def __init__(self, subscribers: set):
+        self.subscribers = subscribers
+        self.queue = asyncio.Queue()
+        subscribers.add(self.queue)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = True, timeout: float = 0.0
+    ) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        self.subscribers.discard(self.queue)
+
+
+class InMemoryEventStorage(EventStorageShard):
+    """
+    Хранилище событий в памяти процесса для развёртывания на одном узле,
+    замеров и тестов. Повторяет поведение RedisEventStorage: индексы по
+    статусу, открытым для ставок и рассчитанным событиям, журнал изменений,
+    outbox и архив. Каждая операция выполняется без переключения задач
+    event loop, поэтому атомарна так же, как Lua-скрипт в Redis.
+    """
+
+    def __init__(self):
+        self.events: dict[int, dict] = {}
+        self.max_event_id = 0
+        # id событий по возрастанию: id выдаются по порядку, поэтому новые
+        # добавляются в конец, а постраничное чтение идёт через bisect
+        self.event_ids: list[int] = []
+        # отсортированные (дедлайн, id) и (коэффициент, id) для фильтров,
+        # аналог zset-индексов RedisEventStorage
+        self.deadline_index: list[tuple[int, int]] = []
+        self.coefficient_index: list[tuple[float, int]] = []
+        self.state_index: dict[int, set[int]] = {
+            state.value: set() for state in EventState
+        }
+        # дедлайны открытых событий; устаревшие записи кучи пропускаются
+        self.open_events: dict[int, int] = {}
+        self.open_heap: list[tuple[int, int]] = []
+        self.settled: dict[int, int] = {}
+        # время приёма последнего записанного коэффициента события
+        self.coefficient_submitted: dict[int, int] = {}
+        self.archive: dict[int, tuple[dict, Optional[float]]] = {}
+        self.version = 0
+        # версия последнего изменения события, порядок ключей - порядок версий
+        self.changes: dict[int, int] = {}
+        # версии удалений в журнале по возрастанию и наибольшая убранная
+        self.tombstones: OrderedDict[int, int] = OrderedDict()
+        self.min_version = 0
+        self.outbox: OrderedDict[int, dict] = OrderedDict()
+        self.outbox_ids = itertools.count(1)
+        self.outbox_ready = asyncio.Event()
+        self.subscribers: set[asyncio.Queue] = set()
+
+    def _touch(self, event_id: int, event: Optional[dict]) -> None:
+        self.version += 1
+        self.changes.pop(event_id, None)
+        self.changes[event_id] = self.version
+        change = {
+            "type": OutboxMessageType.EVENT_CHANGED.value,
+            "event_id": event_id,
+            "version": self.version,
+        }
+        if event is not None:
+            change["event"] = event
+        else:
+            change["deleted"] = True
+            self._add_tombstone(event_id)
+        message = {"data": json.dumps(change, separators=(",", ":")).encode("utf-8")}
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+        self._publish(change)
+
+    def _add_tombstone(self, event_id: int) -> None:
+        """Запоминает удаление в журнале, см. events.scripts._TOMBSTONES."""
+        self.tombstones[event_id] = self.version
+        retention = settings.changes_tombstone_retention
+        if retention <= 0:
+            return
+        for _ in range(2):
+            expired_id, version = next(iter(self.tombstones.items()))
+            if version > self.version - retention:
+                break
+            del self.tombstones[expired_id]
+            del self.changes[expired_id]
+            self.min_version = version
+
+    def _publish(self, message: dict) -> None:
+        self.outbox[next(self.outbox_ids)] = message
+        self.outbox_ready.set()
+
+    def _open(self, event_id: int, deadline: int) -> None:
+        self.open_events[event_id] = deadline
+        heapq.heappush(self.open_heap, (deadline, event_id))
+
+    def _index(self, event: dict) -> None:
+        event_id = event["event_id"]
+        self.event_ids.append(event_id)
+        bisect.insort(self.deadline_index, (event["deadline"], event_id))
+        if event.get("coefficient") is not None:
+            bisect.insort(self.coefficient_index, (event["coefficient"], event_id))
+
+    def _remove(self, event_id: int) -> Optional[dict]:
+        event = self.events.pop(event_id, None)
+        if event is not None:
+            _discard(self.event_ids, event_id)
+            _discard(self.deadline_index, (event["deadline"], event_id))
+            if event.get("coefficient") is not None:
+                _discard(self.coefficient_index, (event["coefficient"], event_id))
+            self.state_index[event["state"]].discard(event_id)
+            self.open_events.pop(event_id, None)
+            self.settled.pop(event_id, None)
+            self.coefficient_submitted.pop(event_id, None)
+        return event
+
+    def _get_event(self, event_id: int) -> dict:
+        event = self.events.get(event_id)
+        if event is None:
+            raise event_not_found(event_id)
+        return dict(event)
+
+    async def call_get_event(self, event_id: int) -> Optional[dict]:
+        return self._get_event(event_id)
+
+    async def get_event_with_version(self, event_id: int) -> tuple[dict, Optional[int]]:
+        return self._get_event(event_id), self.changes.get(event_id)
+
+    async def get_all_events(self) -> list[dict]:
+        return [dict(event) for event in self.events.values()]
+
+    async def get_events_page(
+        self, cursor: int = 0, limit: int = settings.events_page_size
+    ) -> tuple[int, list[dict]]:
+        """Курсор - id, с которого начинается порция."""
+        start = bisect.bisect_left(self.event_ids, cursor)
+        event_ids = self.event_ids[start : start + limit + 1]
+        page = [dict(self.events[event_id]) for event_id in event_ids[:limit]]
+        return (event_ids[limit] if len(event_ids) > limit else 0), page
+
+    async def iter_events(
+        self, chunk_size: int = settings.events_page_size
+    ) -> AsyncIterator[list[bytes]]:
+        events = list(self.events.values())
+        for start in range(0, len(events), chunk_size):
+            yield [
+                encode_event(event, JSON)
+                for event in events[start : start + chunk_size]
+            ]
+
+    async def find_events(
+        self, filters: EventFilter, offset: int = 0, limit: Optional[int] = None
+    ) -> tuple[int, list[dict]]:
+        candidates = []
+        if filters.state is not None:
+            candidates.append(self.state_index[int(filters.state)])
+        if filters.deadline_after is not None or filters.deadline_before is not None:
+            candidates.append(
+                _score_range(
+                    self.deadline_index,
+                    filters.deadline_after,
+                    filters.deadline_before,
+                    inclusive=False,
+                )
+            )
+        if filters.coefficient_min is not None or filters.coefficient_max is not None:
+            candidates.append(
+                _score_range(
+                    self.coefficient_index,
+                    filters.coefficient_min,
+                    filters.coefficient_max,
+                    inclusive=True,
+                )
+            )
+        if candidates:
+            candidates.sort(key=len)
+            matched_ids = sorted(set(candidates[0]).intersection(*candidates[1:]))
+        else:
+            matched_ids = self.event_ids
+        if limit is None:
+            limit = len(matched_ids)
+        events = [
+            dict(self.events[event_id])
+            for event_id in matched_ids[offset : offset + limit]
+        ]
+        next_offset = offset + limit if offset + limit < len(matched_ids) else 0
+        return next_offset, events
+
+    def _create_event(self, event: dict) -> dict:
+        now = int(time.time())
+        self.max_event_id += 1
+        event.update(
+            event_id=self.max_event_id,
+            create_date=now,
+            update_date=now,
+            state=EventState.NEW.value,
+        )
+        self.events[event["event_id"]] = dict(event)
+        self._index(event)
+        self.state_index[EventState.NEW.value].add(event["event_id"])
+        self._open(event["event_id"], event["deadline"])
+        self._touch(event["event_id"], dict(event))
+        return event
+
+    async def add_event(self, event: dict) -> dict:
+        return self._create_event(event)
+
+    async def add_events(self, events: list[dict]) -> list[dict]:
+        return [self._create_event(event) for event in events]
+
+    def _update_status(self, event_id: int, new_status: int) -> dict:
+        if new_status == EventState.NEW.value:
+            return status_update_result(event_id, StatusUpdateResult.INVALID_STATUS)
+        event = self.events.get(event_id)
+        if event is None:
+            return status_update_result(event_id, StatusUpdateResult.NOT_FOUND)
+        if event["state"] != EventState.NEW.value:
+            return status_update_result(event_id, StatusUpdateResult.ALREADY_FINISHED)
+        event["state"] = int(new_status)
+        event["update_date"] = int(time.time())
+        self.state_index[EventState.NEW.value].discard(event_id)
+        self.state_index[event["state"]].add(event_id)
+        self.open_events.pop(event_id, None)
+        self.settled[event_id] = event["update_date"]
+        self._touch(event_id, dict(event))
+        self._publish({"event_id": event_id, "state": event["state"]})
+        return status_update_result(event_id, StatusUpdateResult.UPDATED, dict(event))
+
+    async def update_event(self, event_id: int, new_status: int) -> dict:
+        return raise_for_status_update(self._update_status(event_id, new_status))
+
+    async def update_events(self, updates: list[tuple[int, int]]) -> list[dict]:
+        return [
+            self._update_status(event_id, new_status)
+            for event_id, new_status in updates
+        ]
+
+    async def update_coefficients(
+        self, updates: dict[int, tuple[float, int]]
+    ) -> dict[int, CoefficientUpdateResult]:
+        results = {}
+        now = int(time.time())
+        for event_id, (coefficient, submitted_at) in updates.items():
+            event = self.events.get(event_id)
+            if event is None:
+                results[event_id] = CoefficientUpdateResult.NOT_FOUND
+                continue
+            if event["state"] != EventState.NEW.value:
+                results[event_id] = CoefficientUpdateResult.EVENT_FINISHED
+                continue
+            if event_id not in self.open_events:
+                results[event_id] = CoefficientUpdateResult.BETTING_CLOSED
+                continue
+            if submitted_at < self.coefficient_submitted.get(event_id, 0):
+                results[event_id] = CoefficientUpdateResult.OUTDATED
+                continue
+            self.coefficient_submitted[event_id] = submitted_at
+            if event["coefficient"] == coefficient:
+                results[event_id] = CoefficientUpdateResult.UNCHANGED
+            else:
+                if event.get("coefficient") is not None:
+                    _discard(self.coefficient_index, (event["coefficient"], event_id))
+                bisect.insort(self.coefficient_index, (coefficient, event_id))
+                event["coefficient"] = coefficient
+                event["update_date"] = now
+                self._touch(event_id, dict(event))
+                results[event_id] = CoefficientUpdateResult.UPDATED
+        return results
+
+    async def delete_event(self, event_id: int) -> bool:
+        if self._remove(event_id) is None:
+            return False
+        self._touch(event_id, None)
+        return True
+
+    async def get_catalogue_version(self) -> int:
+        return self.version
+
+    async def get_changes(self, since: str, limit: int) -> dict:
+        since, watermark = parse_changes_since(since)
+        watermark = changes_watermark(since, watermark, self.version, self.min_version)
+        changes = []
+        for event_id in reversed(self.changes):
+            if self.changes[event_id] <= since:
+                break
+            changes.append(event_id)
+        changes = changes[::-1][:limit]
+        events = [dict(self.events[i]) for i in changes if i in self.events]
+        deleted = [i for i in changes if i not in self.events] if since else []
+        has_more = len(changes) == limit
+        last_version = self.changes[changes[-1]] if changes else 0
+        version = last_version if has_more else max(self.version, last_version)
+        return {
+            "version": changes_version(version, has_more, watermark),
+            "has_more": has_more,
+            "events": events,
+            "deleted": deleted,
+            "min_version": str(self.min_version),
+        }
+
+    async def archive_settled_events(self, settled_before: int, limit: int) -> int:
+        event_ids = sorted(
+            (settled_at, event_id)
+            for event_id, settled_at in self.settled.items()
+            if settled_at <= settled_before
+        )[:limit]
+        expires_at = (
+            time.time() + settings.archive_ttl if settings.archive_ttl else None
+        )
+        archived = 0
+        for _, event_id in event_ids:
+            if self.events[event_id]["state"] == EventState.NEW.value:
+                del self.settled[event_id]
+                continue
+            self.archive[event_id] = (self._remove(event_id), expires_at)
+            self._touch(event_id, None)
+            archived += 1
+        return archived
+
+    async def get_archived_event(self, event_id: int) -> dict:
+        event, expires_at = self.archive.get(event_id, (None, None))
+        if event is not None and expires_at is not None and expires_at <= time.time():
+            del self.archive[event_id]
+            event = None
+        if event is None:
+            logger.error(f"События с id {event_id} нет в архиве.")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Такого события нет в архиве!",
+            )
+        return dict(event)
+
+    async def close_expired_betting(self, now: int, limit: int) -> int:
+        closed = 0
+        while self.open_heap and self.open_heap[0][0] <= now and closed < limit:
+            deadline, event_id = heapq.heappop(self.open_heap)
+            if self.open_events.get(event_id) != deadline:
+                continue
+            del self.open_events[event_id]
+            self._publish(
+                {"event_id": event_id, "type": OutboxMessageType.BETTING_CLOSED.value}
+            )
+            closed += 1
+        return closed
+
+    async def subscribe_changes(self) -> LocalSubscription:
+        return LocalSubscription(self.subscribers)
+
+    async def ensure_outbox_group(self) -> None:
+        pass
+
+    async def read_outbox(
+        self, consumer: str, count: int, block_ms: int
+    ) -> list[tuple[int, dict]]:
+        """
+        Все неподтверждённые сообщения по порядку: в процессе один
+        потребитель, поэтому неудачно опубликованные отдаются повторно.
+        """
+        if not self.outbox:
+            self.outbox_ready.clear()
+            try:
+                await asyncio.wait_for(self.outbox_ready.wait(), block_ms / 1000)
+            except asyncio.TimeoutError:
+                return []
+        return list(itertools.islice(self.outbox.items(), count))
+
+    async def ack_outbox(self, entry_ids: list[int]) -> None:
+        for entry_id in entry_ids:
+            self.outbox.pop(entry_id, None)
+
+
+def _discard(index: list, item) -> None:
+    """Убирает элемент из отсортированного списка, если он там есть."""
+    position = bisect.bisect_left(index, item)
+    if position < len(index) and index[position] == item:
+        del index[position]
+
+
+def _score_range(
+    index: list[tuple], low: Optional[float], high: Optional[float], inclusive: bool
+) -> list[int]:
+    """
+    id из отсортированного индекса (значение, id) в диапазоне значений с теми
+    же границами, что и ZRANGEBYSCORE в RedisEventStorage.find_events.
+    """
+    start, end = 0, len(index)
+    if low is not None:
+        bound = (low, -math.inf) if inclusive else (low, math.inf)
+        start = bisect.bisect_left(index, bound)
+    if high is not None:
+        bound = (high, math.inf) if inclusive else (high, -math.inf)
+        end = bisect.bisect_right(index, bound)
+    return [event_id for _, event_id in index[start:end]]
@@ -34,3 +34,57 @@ class EventRequest(BaseModel):
     state: EventState
     create_date: int
     update_date: int
+
+
+class EventStatusUpdate(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+    event_id: int
+    state: EventState
+
+
+class EventCoefficientUpdate(BaseModel):
+    event_id: int
+    coefficient: float = Field(
+        gt=0, lt=30, description="Коэффициент должен быть больше 0, но меньше 30."
+    )
+
+
+class EventBatchResult(BaseModel):
+    """Результат обработки одного элемента пакетного запроса."""
+
+    event_id: Optional[int] = None
+    status_code: int
+    detail: Optional[str] = None
+    event: Optional[EventRequest] = None
+
+
+class EventChanges(BaseModel):
+    """Изменения каталога событий после запрошенной версии."""
+
+    version: str
+    has_more: bool
+    events: list[EventRequest]
+    deleted: list[int]
+    # удаления до этой версии включительно убраны из журнала изменений
+    min_version: str
+
+
+class EventFilter(BaseModel):
+    """Фильтры выборки событий, обслуживаемые вторичными индексами Redis."""
+
+    state: Optional[EventState] = None
+    deadline_after: Optional[int] = Field(
+        None, description="Дедлайн строго позже указанного timestamp."
+    )
+    deadline_before: Optional[int] = Field(
+        None, description="Дедлайн строго раньше указанного timestamp."
+    )
+    coefficient_min: Optional[float] = Field(
+        None, description="Коэффициент не меньше указанного."
+    )
+    coefficient_max: Optional[float] = Field(
+        None, description="Коэффициент не больше указанного."
+    )
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.model_dump().values())
@@ -0,0 +1,345 @@
+"""Lua-скрипты, выполняемые на стороне Redis атомарно и за один запрос."""
+
+# Формат события определяется по первому байту так же, как в events.codecs.
+_CODEC = """
+local function decode_event(data)
+    if string.sub(data, 1, 1) == '{' then
+        return cjson.decode(data)
+    end
+    return cmsgpack.unpack(data)
+end
+
+local function encode_event(event, storage_format)
+    if storage_format == 'msgpack' then
+        return cmsgpack.pack(event)
+    end
+    return cjson.encode(event)
+end
+"""
+
+# Каждое изменение события получает новую версию каталога, а журнал изменений
+# хранит для события только версию его последнего изменения. Об изменении
+# сообщается в канал с тем же именем, что и журнал, и в outbox для рассылки
+# bet_maker (тип events.enums.OutboxMessageType.EVENT_CHANGED): сообщение
+# содержит новое состояние события или признак deleted, если событие убрано
+# из каталога.
+_CHANGES = """
+local function touch_event(version_key, changes_key, outbox_key, event_id, event)
+    local version = redis.call('INCR', version_key)
+    redis.call('ZADD', changes_key, version, event_id)
+    local change = {
+        type = 'event_changed',
+        event_id = tonumber(event_id),
+        version = version,
+    }
+    if event then
+        change['event'] = event
+    else
+        change['deleted'] = true
+    end
+    local message = cjson.encode(change)
+    redis.call('PUBLISH', changes_key, message)
+    redis.call('XADD', outbox_key, '*', 'message', message)
+    return version
+end
+"""
+
+# Удалённое событие остаётся в журнале изменений как удалённое (tombstone) и
+# запоминается в отдельном индексе удалений. Удаления старше retention версий
+# убираются из журнала по две за каждое новое, чтобы журнал рос с числом
+# живых событий, а не со всей историей. Наибольшая убранная версия
+# сохраняется: клиенту с since меньше неё нужна полная синхронизация.
+# retention 0 - удаления хранятся без срока.
+_TOMBSTONES = """
+local function add_tombstone(
+    deleted_key, changes_key, min_version_key, event_id, version, retention
+)
+    redis.call('ZADD', deleted_key, version, event_id)
+    if retention <= 0 then
+        return
+    end
+    local expired = redis.call(
+        'ZRANGEBYSCORE', deleted_key, '-inf', version - retention,
+        'WITHSCORES', 'LIMIT', 0, 2
+    )
+    for i = 1, #expired, 2 do
+        redis.call('ZREM', deleted_key, expired[i])
+        redis.call('ZREM', changes_key, expired[i])
+        redis.call('SET', min_version_key, expired[i + 1])
+    end
+end
+"""
+
+# KEYS[1] - хэш событий, KEYS[2] - счётчик id событий,
+# KEYS[3] - индекс по дедлайну, KEYS[4] - индекс по коэффициенту,
+# KEYS[5] - множество событий в статусе NEW, KEYS[6] - версия каталога,
+# KEYS[7] - журнал изменений, KEYS[8] - индекс открытых для ставок событий,
+# KEYS[9] - поток outbox.
+# ARGV[1] - закодированное событие без event_id, ARGV[2] - формат хранения,
+# ARGV[3] - необязательный id, заранее выделенный на другом шарде.
+# Возвращает id события.
+CREATE_EVENT = (
+    _CODEC
+    + _CHANGES
+    + """
+local event_id = ARGV[3] and tonumber(ARGV[3]) or redis.call('INCR', KEYS[2])
+local event = decode_event(ARGV[1])
+event['event_id'] = event_id
+redis.call('HSET', KEYS[1], event_id, encode_event(event, ARGV[2]))
+redis.call('ZADD', KEYS[3], event['deadline'], event_id)
+if type(event['coefficient']) == 'number' then
+    redis.call('ZADD', KEYS[4], event['coefficient'], event_id)
+end
+redis.call('SADD', KEYS[5], event_id)
+redis.call('ZADD', KEYS[8], event['deadline'], event_id)
+touch_event(KEYS[6], KEYS[7], KEYS[9], event_id, event)
+return event_id
+"""
+)
+
+# KEYS[1] - хэш событий.
+# ARGV[1] - id события, ARGV[2] - прочитанное значение, ARGV[3] - новое значение.
+# Перезаписывает событие, только если оно не изменилось после чтения.
+MIGRATE_EVENT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+return 1
+"""
+
+# KEYS[1] - хэш событий, KEYS[2] - множество событий в статусе NEW,
+# KEYS[3] - множество событий в новом статусе, KEYS[4] - поток outbox,
+# KEYS[5] - версия каталога, KEYS[6] - журнал изменений,
+# KEYS[7] - индекс рассчитанных событий по времени расчёта,
+# KEYS[8] - индекс открытых для ставок событий.
+# ARGV[1] - id события, ARGV[2] - новый статус, ARGV[3] - время обновления,
+# ARGV[4] - формат хранения, ARGV[5] - значение статуса NEW.
+# Перевод в статус NEW не выполняется: событие не рассчитано.
+# Вместе со сменой статуса в outbox записывается сообщение для RabbitMQ.
+# Возвращает {код результата} или {код результата, обновлённое событие},
+# коды соответствуют events.enums.StatusUpdateResult.
+UPDATE_EVENT_STATUS = (
+    _CODEC
+    + _CHANGES
+    + """
+if tonumber(ARGV[2]) == tonumber(ARGV[5]) then
+    return {3}
+end
+local data = redis.call('HGET', KEYS[1], ARGV[1])
+if not data then
+    return {0}
+end
+local event = decode_event(data)
+if event['state'] ~= tonumber(ARGV[5]) then
+    return {1}
+end
+event['state'] = tonumber(ARGV[2])
+event['update_date'] = tonumber(ARGV[3])
+data = encode_event(event, ARGV[4])
+redis.call('HSET', KEYS[1], ARGV[1], data)
+redis.call('SREM', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+redis.call('ZADD', KEYS[7], ARGV[3], ARGV[1])
+redis.call('ZREM', KEYS[8], ARGV[1])
+touch_event(KEYS[5], KEYS[6], KEYS[4], ARGV[1], event)
+redis.call('XADD', KEYS[4], '*', 'message', cjson.encode({
+    event_id = tonumber(ARGV[1]),
+    state = event['state'],
+}))
+return {2, data}
+"""
+)
+
+# KEYS[1] - хэш событий, KEYS[2] - индекс по дедлайну,
+# KEYS[3] - индекс по коэффициенту, KEYS[4] - индекс рассчитанных событий,
+# KEYS[5] - версия каталога, KEYS[6] - журнал изменений,
+# KEYS[7] - индекс открытых для ставок событий, KEYS[8] - поток outbox,
+# KEYS[9] - индекс удалений журнала, KEYS[10] - наименьшая версия журнала,
+# KEYS[11..] - множества событий по статусам.
+# ARGV[1] - id события, ARGV[2] - срок хранения удалений в версиях.
+# Удалённое событие остаётся в журнале изменений и отдаётся как удалённое,
+# см. _TOMBSTONES. Возвращает 1, если событие было удалено, иначе 0.
+DELETE_EVENT = (
+    _CHANGES
+    + _TOMBSTONES
+    + """
+if redis.call('HDEL', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+redis.call('ZREM', KEYS[7], ARGV[1])
+for i = 11, #KEYS do
+    redis.call('SREM', KEYS[i], ARGV[1])
+end
+local version = touch_event(KEYS[5], KEYS[6], KEYS[8], ARGV[1], false)
+add_tombstone(KEYS[9], KEYS[6], KEYS[10], ARGV[1], version, tonumber(ARGV[2]))
+return 1
+"""
+)
+
+# KEYS[1] - хэш событий, KEYS[2] - версия каталога, KEYS[3] - журнал изменений,
+# KEYS[4] - поток outbox.
+# ARGV[1] - id события, ARGV[2] - закодированное событие.
+# Записывает событие, перенесённое с другого шарда, как его изменение.
+IMPORT_EVENT = (
+    _CODEC
+    + _CHANGES
+    + """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return touch_event(KEYS[2], KEYS[3], KEYS[4], ARGV[1], decode_event(ARGV[2]))
+"""
+)
+
+# KEYS[1] - хэш событий, KEYS[2] - индекс по дедлайну,
+# KEYS[3] - индекс по коэффициенту, KEYS[4] - индекс рассчитанных событий,
+# KEYS[5] - версия каталога, KEYS[6] - журнал изменений,
+# KEYS[7] - индекс открытых для ставок событий,
+# KEYS[8..] - множества событий по статусам. ARGV - id событий.
+# Убирает перенесённые на другой шард события без записи об удалении в журнал:
+# для клиентов ленты изменений событие не удалялось. Подписчики получают
+# уведомление moved с текущей версией каталога. Возвращает число убранных
+# событий.
+FORGET_EVENTS = """
+local version = tonumber(redis.call('GET', KEYS[5]) or 0)
+local forgotten = 0
+for _, event_id in ipairs(ARGV) do
+    if redis.call('HDEL', KEYS[1], event_id) == 1 then
+        redis.call('ZREM', KEYS[2], event_id)
+        redis.call('ZREM', KEYS[3], event_id)
+        redis.call('ZREM', KEYS[4], event_id)
+        redis.call('ZREM', KEYS[6], event_id)
+        redis.call('ZREM', KEYS[7], event_id)
+        for i = 8, #KEYS do
+            redis.call('SREM', KEYS[i], event_id)
+        end
+        redis.call('PUBLISH', KEYS[6], cjson.encode({
+            event_id = tonumber(event_id),
+            version = version,
+            moved = true,
+        }))
+        forgotten = forgotten + 1
+    end
+end
+return forgotten
+"""
+
+# KEYS[1] - хэш событий, KEYS[2] - индекс рассчитанных событий,
+# KEYS[3] - индекс по дедлайну, KEYS[4] - индекс по коэффициенту,
+# KEYS[5] - версия каталога, KEYS[6] - журнал изменений, KEYS[7] - поток outbox,
+# KEYS[8] - индекс удалений журнала, KEYS[9] - наименьшая версия журнала,
+# KEYS[10..9+ARGV[3]] - множества событий по статусам, далее - ключи архива
+# в порядке id из ARGV.
+# ARGV[1] - граница времени расчёта, ARGV[2] - TTL архива в секундах
+# (0 - без срока), ARGV[3] - число множеств статусов, ARGV[4] - значение
+# статуса NEW, ARGV[5] - срок хранения удалений в версиях, ARGV[6..] - id
+# событий.
+# Переносит в архив события, рассчитанные не позже границы, и убирает их из
+# рабочего хэша и индексов. Событие в статусе NEW только убирается из индекса
+# рассчитанных. Возвращает число перенесённых событий.
+ARCHIVE_EVENTS = (
+    _CODEC
+    + _CHANGES
+    + _TOMBSTONES
+    + """
+local settled_before = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local states = tonumber(ARGV[3])
+local retention = tonumber(ARGV[5])
+local archived = 0
+for i = 6, #ARGV do
+    local event_id = ARGV[i]
+    local archive_key = KEYS[9 + states + i - 5]
+    local settled_at = redis.call('ZSCORE', KEYS[2], event_id)
+    if settled_at and tonumber(settled_at) <= settled_before then
+        redis.call('ZREM', KEYS[2], event_id)
+        local data = redis.call('HGET', KEYS[1], event_id)
+        if data and decode_event(data)['state'] ~= tonumber(ARGV[4]) then
+            if ttl > 0 then
+                redis.call('SET', archive_key, data, 'EX', ttl)
+            else
+                redis.call('SET', archive_key, data)
+            end
+            redis.call('HDEL', KEYS[1], event_id)
+            redis.call('ZREM', KEYS[3], event_id)
+            redis.call('ZREM', KEYS[4], event_id)
+            for j = 10, 9 + states do
+                redis.call('SREM', KEYS[j], event_id)
+            end
+            local version = touch_event(KEYS[5], KEYS[6], KEYS[7], event_id, false)
+            add_tombstone(KEYS[8], KEYS[6], KEYS[9], event_id, version, retention)
+            archived = archived + 1
+        end
+    end
+end
+return archived
+"""
+)
+
+# KEYS[1] - индекс открытых для ставок событий, KEYS[2] - хэш событий,
+# KEYS[3] - поток outbox.
+# ARGV[1] - текущее время, ARGV[2] - размер порции, ARGV[3] - тип сообщения.
+# Закрывает приём ставок на события с наступившим дедлайном и записывает
+# сообщение о закрытии в outbox. Возвращает число обработанных событий.
+CLOSE_BETTING = """
+local event_ids = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2]
+)
+for _, event_id in ipairs(event_ids) do
+    redis.call('ZREM', KEYS[1], event_id)
+    if redis.call('HEXISTS', KEYS[2], event_id) == 1 then
+        redis.call('XADD', KEYS[3], '*', 'message', cjson.encode({
+            event_id = tonumber(event_id),
+            type = ARGV[3],
+        }))
+    end
+end
+return #event_ids
+"""
+
+# KEYS[1] - хэш событий, KEYS[2] - индекс по коэффициенту,
+# KEYS[3] - версия каталога, KEYS[4] - журнал изменений,
+# KEYS[5] - хэш времени приёма записанных коэффициентов,
+# KEYS[6] - индекс открытых для ставок событий, KEYS[7] - поток outbox.
+# ARGV[1] - id события, ARGV[2] - новый коэффициент, ARGV[3] - время
+# обновления, ARGV[4] - формат хранения, ARGV[5] - значение статуса NEW,
+# ARGV[6] - время приёма коэффициента в микросекундах.
+# Коэффициент меняется только у событий, ещё принимающих ставки: в статусе NEW
+# и с ненаступившим дедлайном. Кроме того, он не меняется, если записан
+# коэффициент, принятый позже: обновления копятся в каждом процессе отдельно
+# и могут прийти в Redis не по порядку.
+# Возвращает код events.enums.CoefficientUpdateResult.
+SET_COEFFICIENT = (
+    _CODEC
+    + _CHANGES
+    + """
+local data = redis.call('HGET', KEYS[1], ARGV[1])
+if not data then
+    return 0
+end
+local event = decode_event(data)
+if event['state'] ~= tonumber(ARGV[5]) then
+    return 1
+end
+if not redis.call('ZSCORE', KEYS[6], ARGV[1]) then
+    return 5
+end
+local submitted_at = tonumber(ARGV[6])
+if submitted_at < tonumber(redis.call('HGET', KEYS[5], ARGV[1]) or '0') then
+    return 4
+end
+redis.call('HSET', KEYS[5], ARGV[1], ARGV[6])
+local coefficient = tonumber(ARGV[2])
+if event['coefficient'] == coefficient then
+    return 3
+end
+event['coefficient'] = coefficient
+event['update_date'] = tonumber(ARGV[3])
+redis.call('HSET', KEYS[1], ARGV[1], encode_event(event, ARGV[4]))
+redis.call('ZADD', KEYS[2], coefficient, ARGV[1])
+touch_event(KEYS[3], KEYS[4], KEYS[7], ARGV[1], event)
+return 2
+"""
+)
@@ -0,0 +1,290 @@
+import asyncio
+import bisect
+import hashlib
+from collections import defaultdict
+from itertools import chain
+from operator import itemgetter
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.logger import logger
+from events.base import EventStorage
+from events.codecs import decode_event
+from events.crud import RedisEventStorage
+from events.schemas import EventFilter
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Консистентное хэширование id событий по шардам. Каждый шард занимает
+    replicas точек на кольце, поэтому при добавлении шарда переезжает
+    примерно 1/N событий.
+    """
+
+    def __init__(self, nodes: list[str], replicas: int = settings.redis_shard_replicas):
+        points = sorted(
+            (_hash(f"{node}#{replica}"), index)
+            for index, node in enumerate(nodes)
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.indexes = [index for _, index in points]
+
+    def get_index(self, key: Union[int, str]) -> int:
+        position = bisect.bisect(self.hashes, _hash(str(key))) % len(self.hashes)
+        return self.indexes[position]
+
+
+class ShardedEventStorage(EventStorage):
+    """
+    Хранилище событий на нескольких экземплярах Redis. Каждый шард - обычное
+    RedisEventStorage со своими индексами, журналом изменений и outbox.
+    Запросы по одному событию направляются на шард его id, списки собираются
+    параллельно со всех шардов. Счётчик id событий хранится на первом шарде,
+    поэтому новые шарды добавляются в конец списка.
+
+    Кольцо строится по именам шардов, а не по адресам подключения: смена
+    пароля или хоста Redis не должна переносить события на другой шард.
+    """
+
+    def __init__(
+        self, shards: list[RedisEventStorage], names: Optional[list[str]] = None
+    ):
+        names = names or [f"shard-{index}" for index in range(len(shards))]
+        if len(names) != len(shards) or len(set(names)) != len(names):
+            raise ValueError(
+                "Имена шардов должны быть уникальны и заданы для каждого шарда."
+            )
+        self._shards = shards
+        self.names = names
+        self.ring = HashRing(names)
+
+    @property
+    def shards(self) -> list[RedisEventStorage]:
+        return self._shards
+
+    def shard_for(self, event_id: int) -> RedisEventStorage:
+        return self.shards[self.ring.get_index(event_id)]
+
+    def _group_by_shard(
+        self, event_ids: list[int]
+    ) -> dict[RedisEventStorage, list[int]]:
+        """Группирует позиции id в исходном списке по шардам."""
+        groups = defaultdict(list)
+        for position, event_id in enumerate(event_ids):
+            groups[self.shard_for(event_id)].append(position)
+        return groups
+
+    async def call_get_event(self, event_id) -> Optional[dict]:
+        return await self.shard_for(event_id).call_get_event(event_id)
+
+    async def get_event_with_version(self, event_id: int):
+        return await self.shard_for(event_id).get_event_with_version(event_id)
+
+    async def get_all_events(self) -> list[dict]:
+        results = await asyncio.gather(
+            *(shard.get_all_events() for shard in self.shards)
+        )
+        return list(chain.from_iterable(results))
+
+    async def get_events_page(
+        self, cursor: int = 0, limit: int = settings.events_page_size
+    ) -> tuple[int, list[dict]]:
+        """
+        Шарды обходятся по очереди, курсор кодирует номер шарда и курсор
+        порции внутри него: shard_cursor * число шардов + номер шарда.
+        """
+        shard_cursor, index = divmod(cursor, len(self.shards))
+        next_shard_cursor, events = await self.shards[index].get_events_page(
+            cursor=shard_cursor, limit=limit
+        )
+        if next_shard_cursor:
+            return next_shard_cursor * len(self.shards) + index, events
+        return (index + 1) % len(self.shards), events
+
+    async def iter_events(
+        self, chunk_size: int = settings.events_page_size
+    ) -> AsyncIterator[list[bytes]]:
+        for shard in self.shards:
+            async for chunk in shard.iter_events(chunk_size):
+                yield chunk
+
+    async def find_events(
+        self,
+        filters: EventFilter,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> tuple[int, list[dict]]:
+        """
+        Каждый шард отдаёт первые offset + limit подходящих событий по
+        возрастанию id, из объединения берётся запрошенная порция.
+        """
+        window = None if limit is None else offset + limit
+        results = await asyncio.gather(
+            *(shard.find_events(filters, 0, window) for shard in self.shards)
+        )
+        events = sorted(
+            chain.from_iterable(events for _, events in results),
+            key=itemgetter("event_id"),
+        )
+        if limit is None:
+            return 0, events[offset:]
+        has_more = len(events) > window or any(
+            next_offset for next_offset, _ in results
+        )
+        return window if has_more else 0, events[offset:window]
+
+    async def add_event(self, event: dict) -> dict:
+        (event_id,) = await self.shards[0].allocate_event_ids(1)
+        return await self.shard_for(event_id).add_event(event, event_id)
+
+    async def add_events(self, events: list[dict]) -> list[dict]:
+        event_ids = await self.shards[0].allocate_event_ids(len(events))
+        groups = self._group_by_shard(event_ids)
+        await asyncio.gather(
+            *(
+                shard.add_events(
+                    [events[position] for position in positions],
+                    [event_ids[position] for position in positions],
+                )
+                for shard, positions in groups.items()
+            )
+        )
+        return events
+
+    async def update_event(self, event_id: int, new_status: int) -> dict:
+        return await self.shard_for(event_id).update_event(event_id, new_status)
+
+    async def update_events(self, updates: list[tuple[int, int]]) -> list[dict]:
+        groups = self._group_by_shard([event_id for event_id, _ in updates])
+        replies = await asyncio.gather(
+            *(
+                shard.update_events([updates[position] for position in positions])
+                for shard, positions in groups.items()
+            )
+        )
+        results = [None] * len(updates)
+        for positions, shard_results in zip(groups.values(), replies):
+            for position, result in zip(positions, shard_results):
+                results[position] = result
+        return results
+
+    async def update_coefficients(self, updates: dict[int, tuple[float, int]]) -> dict:
+        groups = defaultdict(dict)
+        for event_id, update in updates.items():
+            groups[self.shard_for(event_id)][event_id] = update
+        replies = await asyncio.gather(
+            *(shard.update_coefficients(group) for shard, group in groups.items())
+        )
+        return {
+            event_id: result
+            for shard_results in replies
+            for event_id, result in shard_results.items()
+        }
+
+    async def delete_event(self, event_id: int):
+        return await self.shard_for(event_id).delete_event(event_id)
+
+    async def archive_settled_events(self, settled_before: int, limit: int) -> int:
+        results = await asyncio.gather(
+            *(
+                shard.archive_settled_events(settled_before, limit)
+                for shard in self.shards
+            )
+        )
+        return sum(results)
+
+    async def close_expired_betting(self, now: int, limit: int) -> int:
+        results = await asyncio.gather(
+            *(shard.close_expired_betting(now, limit) for shard in self.shards)
+        )
+        return sum(results)
+
+    async def get_archived_event(self, event_id: int) -> dict:
+        return await self.shard_for(event_id).get_archived_event(event_id)
+
+    async def get_catalogue_version(self) -> str:
+        """Версия каталога - версии шардов через точку."""
+        versions = await asyncio.gather(
+            *(shard.get_catalogue_version() for shard in self.shards)
+        )
+        return ".".join(str(version) for version in versions)
+
+    async def get_changes(self, since: str, limit: int) -> dict:
+        """
+        Лента изменений по всем шардам: since и версия в ответе содержат
+        версии шардов через точку, с каждого шарда отдаётся до limit
+        изменений. Версия "0" запрашивает изменения с начала на всех шардах.
+        """
+        versions = since.split(".")
+        if since == "0":
+            versions = versions * len(self.shards)
+        if len(versions) != len(self.shards):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректная версия каталога.",
+            )
+        results = await asyncio.gather(
+            *(
+                shard.get_changes(version, limit)
+                for shard, version in zip(self.shards, versions)
+            )
+        )
+        return {
+            "version": ".".join(result["version"] for result in results),
+            "has_more": any(result["has_more"] for result in results),
+            "events": list(chain.from_iterable(r["events"] for r in results)),
+            "deleted": list(chain.from_iterable(r["deleted"] for r in results)),
+            "min_version": ".".join(result["min_version"] for result in results),
+        }
+
+    async def rebuild_indexes(self) -> int:
+        results = await asyncio.gather(
+            *(shard.rebuild_indexes() for shard in self.shards)
+        )
+        return sum(results)
+
+    async def migrate_format(
+        self, storage_format: str = settings.event_storage_format
+    ) -> int:
+        results = await asyncio.gather(
+            *(shard.migrate_format(storage_format) for shard in self.shards)
+        )
+        return sum(results)
+
+    async def rebalance(self, chunk_size: int = settings.events_page_size) -> int:
+        """
+        Переносит события и архив на шарды, которым они принадлежат по
+        кольцу. Событие сначала записывается на новый шард, затем убирается
+        со старого. Запускается после добавления шардов при остановленной
+        записи событий. Возвращает число перенесённых событий.
+        """
+        moved = 0
+        for shard in self.shards:
+            async for chunk in shard.iter_events(chunk_size):
+                targets = defaultdict(list)
+                for event_data in chunk:
+                    event_id = decode_event(event_data)["event_id"]
+                    target = self.shard_for(event_id)
+                    if target is not shard:
+                        targets[target].append((event_id, event_data))
+                for target, events in targets.items():
+                    await target.import_events([data for _, data in events])
+                    moved += await shard.forget_events([eid for eid, _ in events])
+            async for chunk in shard.iter_archived_events(chunk_size):
+                targets = defaultdict(list)
+                for archived in chunk:
+                    target = self.shard_for(archived[0])
+                    if target is not shard:
+                        targets[target].append(archived)
+                for target, archived in targets.items():
+                    await target.import_archived_events(archived)
+                    await shard.forget_archived_events([item[0] for item in archived])
+        logger.info(f"Перенесено между шардами {moved} событий.")
+        return moved
@@ -1,32 +1,109 @@
 from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException, status, Depends
+from fastapi import (
+    Body,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from core.archiver import EventArchiver
 from core.authentication_utils import check_bot_token
+from core.catalogue_snapshot import CatalogueSnapshot
+from core.change_listener import ChangeListener
+from core.coefficient_updater import CoefficientUpdater
+from core.config import settings
+from core.deadline_scheduler import DeadlineScheduler
+from core.event_feed import EventFeed
+from core.etag import is_not_modified, make_etag
 from core.logger import request_log, logger
-from events.crud import RedisEventStorage
+from core.outbox_relay import OutboxRelay
+from events.codecs import to_json_bytes
 from events.enums import EventState
 from core.rabbit_producer import RabbitMQProducer
-from events.schemas import Event, EventRequest
+from events.schemas import (
+    Event,
+    EventBatchResult,
+    EventChanges,
+    EventCoefficientUpdate,
+    EventFilter,
+    EventRequest,
+    EventStatusUpdate,
+)
+from events.backends import create_event_storage, create_redis_clients
 
 rabbitmq_producer = RabbitMQProducer()
+redis_clients = create_redis_clients()
+event_storage = create_event_storage(redis_clients)
+# outbox, журнал изменений и кэш чтения у каждого шарда свои
+outbox_relays = [
+    OutboxRelay(shard, rabbitmq_producer, shard_index)
+    for shard_index, shard in enumerate(event_storage.shards)
+]
+change_listeners = [ChangeListener(shard) for shard in event_storage.shards]
+event_feed = EventFeed()
+catalogue_snapshots = []
+for change_listener in change_listeners:
+    if settings.read_cache_enabled and settings.event_storage_backend == "redis":
+        change_listener.add_handler(change_listener.storage.read_cache)
+    change_listener.add_handler(event_feed)
+    if settings.catalogue_snapshot_enabled:
+        catalogue_snapshots.append(CatalogueSnapshot(change_listener.storage))
+        change_listener.add_handler(catalogue_snapshots[-1])
+event_archiver = EventArchiver(event_storage)
+deadline_scheduler = DeadlineScheduler(event_storage)
+coefficient_updater = CoefficientUpdater(event_storage)
 
 
 @asynccontextmanager
-async def rabbitmq_lifespan(app: FastAPI):
+async def lifespan(app: FastAPI):
+    logger.info("Подключение к Redis...")
+    for redis_client in redis_clients:
+        await redis_client.connect()
     logger.info("Подключение к RabbitMQ...")
     await rabbitmq_producer.connect()
+    logger.info("Подписка на изменения событий...")
+    for change_listener in change_listeners:
+        await change_listener.start()
+    logger.info("Запуск публикации сообщений из outbox...")
+    for outbox_relay in outbox_relays:
+        await outbox_relay.start()
+    logger.info("Запуск архивации рассчитанных событий...")
+    await event_archiver.start()
+    logger.info("Запуск закрытия приёма ставок по дедлайну...")
+    await deadline_scheduler.start()
+    logger.info("Запуск записи обновлений коэффициентов...")
+    await coefficient_updater.start()
     yield
+    logger.info("Остановка записи обновлений коэффициентов...")
+    await coefficient_updater.close()
+    logger.info("Остановка закрытия приёма ставок по дедлайну...")
+    await deadline_scheduler.close()
+    logger.info("Остановка архивации рассчитанных событий...")
+    await event_archiver.close()
+    logger.info("Остановка публикации сообщений из outbox...")
+    for outbox_relay in outbox_relays:
+        await outbox_relay.close()
+    logger.info("Остановка подписки на изменения событий...")
+    for change_listener in change_listeners:
+        await change_listener.close()
     logger.info("Закрытие соединения RabbitMQ...")
     await rabbitmq_producer.close()
+    logger.info("Закрытие пула соединений Redis...")
+    for redis_client in redis_clients:
+        await redis_client.close()
 
 
-app = FastAPI(lifespan=rabbitmq_lifespan)
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(BaseHTTPMiddleware, dispatch=request_log)
 
-redis_storage = RedisEventStorage()
-
 
 @app.post(
     "/event",
@@ -35,17 +112,143 @@ redis_storage = RedisEventStorage()
 )
 async def create_event(event: Event) -> dict:
     event = event.model_dump()
-    new_event = await redis_storage.add_event(event)
+    new_event = await event_storage.add_event(event)
     return new_event
 
 
+def get_catalogue_snapshot() -> Optional[tuple[bytes, str]]:
+    """
+    JSON всего каталога из снимков шардов и версия каталога, которую он
+    отражает, в формате get_catalogue_version; None, если снимки не готовы.
+    """
+    if not catalogue_snapshots:
+        return None
+    parts = [snapshot.get_events_json() for snapshot in catalogue_snapshots]
+    if any(part is None for part in parts):
+        return None
+    version = ".".join(str(snapshot.version) for snapshot in catalogue_snapshots)
+    return b"[" + b",".join(part for part in parts if part) + b"]", version
+
+
 @app.get(
     "/events",
     response_model=list[EventRequest],
     dependencies=[Depends(check_bot_token)],
 )
-async def get_all_events() -> list[dict]:
-    return await redis_storage.get_all_events()
+async def get_all_events(
+    request: Request,
+    response: Response,
+    filters: EventFilter = Depends(),
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, gt=0, le=settings.events_page_max_size),
+):
+    """
+    Без параметров возвращает все события, по возможности готовым JSON из
+    снимка каталога без разбора событий. При передаче cursor или limit
+    возвращает одну порцию, курсор следующей порции передаётся в заголовке
+    X-Next-Cursor (значение 0 означает конец списка).
+    Фильтры state, deadline_after, deadline_before, coefficient_min и
+    coefficient_max обслуживаются вторичными индексами без просмотра хэша.
+    Ответ содержит ETag версии каталога, на запрос с совпадающим
+    If-None-Match возвращается 304 без тела. Ответ со всем каталогом также
+    содержит заголовок X-Catalogue-Version: версию, изменения до которой
+    включительно в нём учтены. bet_maker не применяет к такой копии
+    полученные из RabbitMQ изменения не новее этой версии.
+    """
+    snapshot = None
+    whole_catalogue = filters.is_empty() and cursor is None and limit is None
+    if whole_catalogue:
+        snapshot = get_catalogue_snapshot()
+    if snapshot is not None:
+        # версия снимка может отставать от хранилища, ETag - по снимку
+        snapshot_json, version = snapshot
+    else:
+        version = await event_storage.get_catalogue_version()
+    headers = {"ETag": make_etag(version, str(request.query_params))}
+    if whole_catalogue:
+        headers["X-Catalogue-Version"] = str(version)
+    if is_not_modified(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    if not filters.is_empty():
+        next_cursor, events = await event_storage.find_events(
+            filters,
+            offset=cursor or 0,
+            limit=limit,
+        )
+        if cursor is not None or limit is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        return events
+    if snapshot is not None:
+        return Response(
+            content=snapshot_json, media_type="application/json", headers=headers
+        )
+    if cursor is None and limit is None:
+        return await event_storage.get_all_events()
+    next_cursor, events = await event_storage.get_events_page(
+        cursor=cursor or 0, limit=limit or settings.events_page_size
+    )
+    response.headers["X-Next-Cursor"] = str(next_cursor)
+    return events
+
+
+@app.get(
+    "/events/stream",
+    dependencies=[Depends(check_bot_token)],
+)
+async def stream_all_events() -> StreamingResponse:
+    """Потоковая выдача всех событий в формате NDJSON, по одному событию в строке."""
+
+    async def ndjson_lines():
+        async for chunk in event_storage.iter_events():
+            if chunk:
+                yield b"\n".join(to_json_bytes(event) for event in chunk) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/events/feed",
+    dependencies=[Depends(check_bot_token)],
+)
+async def events_feed() -> StreamingResponse:
+    """
+    Живая лента изменений событий в формате Server-Sent Events: кадр change
+    содержит новое состояние события, кадр delete - id удалённого или
+    перенесённого в архив события. После кадра resync часть изменений могла
+    быть пропущена, клиенту нужно догнать их через /events/changes.
+    """
+    return StreamingResponse(
+        event_feed.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get(
+    "/events/changes",
+    response_model=EventChanges,
+    dependencies=[Depends(check_bot_token)],
+)
+async def get_events_changes(
+    since: str = Query("0", pattern=r"^\d+(:\d+)?(\.\d+(:\d+)?)*$"),
+    limit: int = Query(
+        settings.events_page_size, gt=0, le=settings.events_page_max_size
+    ),
+) -> dict:
+    """
+    Инкрементальная лента изменений: события, созданные или изменённые после
+    версии since, и id удалённых событий. Для полной синхронизации передаётся
+    since=0, далее - версия из предыдущего ответа, пока has_more истинно.
+    Версия в ответе меньше since означает, что хранилище было очищено и
+    нужна полная синхронизация. Записи об удалениях хранятся ограниченное
+    число версий (changes_tombstone_retention): если удаления после версии,
+    с которой клиент знает каталог, уже убраны, возвращается 410 и нужна
+    полная синхронизация с since=0. Пока has_more истинно, версия в ответе
+    содержит через двоеточие версию начала обхода. При нескольких шардах версия состоит
+    из версий шардов через точку и сравнивается покомпонентно.
+    """
+    return await event_storage.get_changes(since, limit)
 
 
 @app.get(
@@ -53,8 +256,15 @@ async def get_all_events() -> list[dict]:
     response_model=EventRequest,
     dependencies=[Depends(check_bot_token)],
 )
-async def get_event(event_id: int) -> dict:
-    event = await redis_storage.call_get_event(event_id)
+async def get_event(event_id: int, request: Request, response: Response):
+    event, version = await event_storage.get_event_with_version(event_id)
+    if version is not None:
+        etag = make_etag(version)
+        if is_not_modified(request, etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+        response.headers["ETag"] = etag
     return event
 
 
@@ -64,11 +274,93 @@ async def get_event(event_id: int) -> dict:
     dependencies=[Depends(check_bot_token)],
 )
 async def update_event_status(event_id: int, new_status: EventState) -> dict:
-    event = await redis_storage.update_event(event_id, new_status)
+    if new_status is EventState.NEW:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Событие можно перевести только в статус расчёта.",
+        )
+    # Сообщение для RabbitMQ записывается в outbox вместе со сменой статуса
+    # и публикуется фоновой задачей OutboxRelay.
+    return await event_storage.update_event(event_id, new_status)
 
-    message = {"event_id": event_id, "state": new_status}
-    await rabbitmq_producer.publish_message(message)
-    return event
+
+@app.post(
+    "/events/batch",
+    response_model=list[EventBatchResult],
+    dependencies=[Depends(check_bot_token)],
+)
+async def create_events_batch(
+    events: list[Event] = Body(..., max_length=settings.events_batch_max_size),
+) -> list[dict]:
+    new_events = await event_storage.add_events(
+        [event.model_dump() for event in events]
+    )
+    return [
+        {
+            "event_id": event["event_id"],
+            "status_code": status.HTTP_201_CREATED,
+            "event": event,
+        }
+        for event in new_events
+    ]
+
+
+@app.patch(
+    "/events/status/batch",
+    response_model=list[EventBatchResult],
+    dependencies=[Depends(check_bot_token)],
+)
+async def update_events_status_batch(
+    updates: list[EventStatusUpdate] = Body(
+        ..., max_length=settings.events_batch_max_size
+    ),
+) -> list[dict]:
+    # перевод в статус NEW отклоняется хранилищем с кодом 422 для элемента
+    return await event_storage.update_events(
+        [(update.event_id, update.state) for update in updates]
+    )
+
+
+def submit_coefficient(event_id: int, coefficient: float) -> None:
+    if not coefficient_updater.submit(event_id, coefficient):
+        logger.error("Очередь обновлений коэффициентов переполнена.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Очередь обновлений коэффициентов переполнена.",
+        )
+
+
+@app.patch(
+    "/event/{event_id}/coefficient",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(check_bot_token)],
+)
+async def update_event_coefficient(
+    event_id: int, new_coefficient: float = Query(..., gt=0, lt=30)
+) -> dict:
+    """
+    Принимает новый коэффициент события. Запись выполняется в фоне: из
+    обновлений одного события, пришедших за окно записи, сохраняется только
+    последнее. Коэффициент рассчитанного или удалённого события не меняется.
+    """
+    submit_coefficient(event_id, new_coefficient)
+    return {"status": "Обновление коэффициента принято."}
+
+
+@app.patch(
+    "/events/coefficient/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(check_bot_token)],
+)
+async def update_events_coefficient_batch(
+    updates: list[EventCoefficientUpdate] = Body(
+        ..., max_length=settings.events_batch_max_size
+    ),
+) -> dict:
+    """Пакетный вариант PATCH /event/{event_id}/coefficient."""
+    for update in updates:
+        submit_coefficient(update.event_id, update.coefficient)
+    return {"status": f"Принято обновлений коэффициентов: {len(updates)}."}
 
 
 @app.delete(
@@ -76,9 +368,27 @@ async def update_event_status(event_id: int, new_status: EventState) -> dict:
     dependencies=[Depends(check_bot_token)],
 )
 async def delete_event(event_id: int) -> dict:
-    event = await redis_storage.delete_event(event_id)
+    event = await event_storage.delete_event(event_id)
     if event:
         return {"status": "Событие успешно удалено из системы."}
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND, detail="Такого события нет в системе."
     )
+
+
+@app.get(
+    "/archive/event/{event_id}",
+    response_model=EventRequest,
+    dependencies=[Depends(check_bot_token)],
+)
+async def get_archived_event(event_id: int) -> dict:
+    """Рассчитанное событие, перенесённое из рабочего каталога в архив."""
+    return await event_storage.get_archived_event(event_id)
+
+
+@app.get(
+    "/stats/publisher",
+    dependencies=[Depends(check_bot_token)],
+)
+async def get_publisher_stats() -> dict:
+    return rabbitmq_producer.get_stats()
@@ -0,0 +1,118 @@
+"""
+Служебные команды line_provider.
+
+Пример запуска внутри контейнера:
+    python manage.py rebuild-indexes
+    python manage.py migrate-format msgpack
+    python manage.py rebalance
+    python manage.py bench-codecs --events 100000
+"""
+
+import argparse
+import asyncio
+import time
+import timeit
+
+from core.config import settings
+from core.logger import logger
+from events import codecs
+from events.backends import create_event_storage, create_redis_clients
+from events.sharding import ShardedEventStorage
+
+
+async def rebuild_indexes(storage, args) -> None:
+    await storage.rebuild_indexes()
+
+
+async def migrate_format(storage, args) -> None:
+    await storage.migrate_format(args.storage_format)
+
+
+async def rebalance(storage, args) -> None:
+    if not isinstance(storage, ShardedEventStorage):
+        logger.info("Задан один экземпляр Redis, переносить события некуда.")
+        return
+    await storage.rebalance()
+
+
+COMMANDS = {
+    "rebuild-indexes": rebuild_indexes,
+    "migrate-format": migrate_format,
+    "rebalance": rebalance,
+}
+
+
+def bench_codecs(args) -> None:
+    """
+    Сравнивает размер и время декодирования событий в форматах хранения
+    на синтетическом каталоге, повторяющем путь get_all_events.
+    """
+    now = int(time.time())
+    events = [
+        {
+            "coefficient": round(1 + (event_id % 2900) / 100, 2),
+            "deadline": now + event_id,
+            "create_date": now,
+            "update_date": now,
+            "state": 1,
+            "event_id": event_id,
+        }
+        for event_id in range(1, args.events + 1)
+    ]
+    for storage_format in codecs.FORMATS:
+        encoded = [codecs.encode_event(event, storage_format) for event in events]
+        size = sum(len(data) for data in encoded)
+        decode_time = min(
+            timeit.repeat(
+                lambda: [codecs.decode_event(data) for data in encoded],
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(
+            f"{storage_format:>8}: {size / len(encoded):6.1f} байт/событие, "
+            f"всего {size / 1024:10.1f} КБ, "
+            f"декодирование {decode_time * 1000:8.1f} мс"
+        )
+
+
+async def main(args) -> None:
+    if settings.event_storage_backend != "redis":
+        logger.error("Служебные команды работают только с хранилищем в Redis.")
+        return
+    redis_clients = create_redis_clients()
+    try:
+        for redis_client in redis_clients:
+            await redis_client.connect()
+        await COMMANDS[args.command](create_event_storage(redis_clients), args)
+    finally:
+        for redis_client in redis_clients:
+            await redis_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "rebuild-indexes", help="Перестроить вторичные индексы событий."
+    )
+    subparsers.add_parser(
+        "rebalance",
+        help="Перенести события на шарды по кольцу после добавления шардов.",
+    )
+    migrate_parser = subparsers.add_parser(
+        "migrate-format", help="Перекодировать хранящиеся события в другой формат."
+    )
+    migrate_parser.add_argument("storage_format", choices=codecs.FORMATS)
+    bench_parser = subparsers.add_parser(
+        "bench-codecs", help="Сравнить форматы хранения событий."
+    )
+    bench_parser.add_argument("--events", type=int, default=100_000)
+    bench_parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.info("Запуск служебной команды.")
+    if args.command == "bench-codecs":
+        bench_codecs(args)
+    else:
+        asyncio.run(main(args))
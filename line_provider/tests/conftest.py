@@ -0,0 +1,25 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# сервис запускается из своего каталога и импортирует модули верхнего уровня
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("EVENT_STORAGE_BACKEND", "memory")
+
+from events.memory import InMemoryEventStorage  # noqa: E402
+
+
+@pytest.fixture
+def storage() -> InMemoryEventStorage:
+    return InMemoryEventStorage()
+
+
+@pytest.fixture
+def run():
+    """Выполняет корутину хранилища в отдельном event loop."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
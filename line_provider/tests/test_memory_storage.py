@@ -0,0 +1,245 @@
+"""
+Контракт EventStorage на InMemoryEventStorage: хранилище повторяет поведение
+RedisEventStorage, поэтому тесты проверяют его без Redis.
+"""
+
+import time
+
+import pytest
+from fastapi import HTTPException, status
+
+from core.config import settings
+from events.enums import (
+    CoefficientUpdateResult,
+    EventState,
+    OutboxMessageType,
+)
+from events.schemas import EventFilter
+
+
+def create(storage, run, count=1, coefficient=1.5, deadline=None):
+    deadline = deadline or int(time.time()) + 3600
+    return run(
+        storage.add_events(
+            [
+                {"coefficient": coefficient, "deadline": deadline + i}
+                for i in range(count)
+            ]
+        )
+    )
+
+
+def outbox_types(storage):
+    return [message.get("type") for message in storage.outbox.values()]
+
+
+def test_create_assigns_ids_and_new_state(storage, run):
+    events = create(storage, run, count=3)
+
+    assert [event["event_id"] for event in events] == [1, 2, 3]
+    assert all(event["state"] == EventState.NEW for event in events)
+    assert run(storage.call_get_event(2))["coefficient"] == 1.5
+    assert run(storage.get_catalogue_version()) == 3
+
+
+def test_get_missing_event_is_404(storage, run):
+    with pytest.raises(HTTPException) as error:
+        run(storage.call_get_event(1))
+    assert error.value.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_events_page_follows_id_cursor(storage, run):
+    create(storage, run, count=7)
+    run(storage.delete_event(3))
+
+    seen, cursor = [], 0
+    while True:
+        cursor, page = run(storage.get_events_page(cursor, limit=2))
+        assert len(page) <= 2
+        seen += [event["event_id"] for event in page]
+        if not cursor:
+            break
+
+    assert seen == [1, 2, 4, 5, 6, 7]
+
+
+def test_status_update_settles_event_once(storage, run):
+    create(storage, run)
+
+    event = run(storage.update_event(1, EventState.FINISHED_WIN.value))
+    assert event["state"] == EventState.FINISHED_WIN
+
+    with pytest.raises(HTTPException) as error:
+        run(storage.update_event(1, EventState.FINISHED_LOSE.value))
+    assert error.value.status_code == status.HTTP_403_FORBIDDEN
+    assert run(storage.call_get_event(1))["state"] == EventState.FINISHED_WIN
+
+
+def test_status_update_rejects_new_and_missing(storage, run):
+    create(storage, run)
+
+    results = run(
+        storage.update_events([(1, EventState.NEW.value), (2, EventState.NEW.value)])
+    )
+
+    assert [result["status_code"] for result in results] == [
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+    ]
+    results = run(storage.update_events([(2, EventState.FINISHED_WIN.value)]))
+    assert results[0]["status_code"] == status.HTTP_404_NOT_FOUND
+    assert run(storage.call_get_event(1))["state"] == EventState.NEW
+
+
+def test_status_update_is_published_to_outbox(storage, run):
+    create(storage, run)
+    run(storage.update_event(1, EventState.FINISHED_LOSE.value))
+
+    assert {"event_id": 1, "state": EventState.FINISHED_LOSE.value} in list(
+        storage.outbox.values()
+    )
+
+
+def test_coefficient_updates(storage, run):
+    create(storage, run, count=2)
+    run(storage.update_event(2, EventState.FINISHED_WIN.value))
+
+    results = run(
+        storage.update_coefficients({1: (2.5, 100), 2: (2.5, 100), 3: (2.5, 100)})
+    )
+    assert results == {
+        1: CoefficientUpdateResult.UPDATED,
+        2: CoefficientUpdateResult.EVENT_FINISHED,
+        3: CoefficientUpdateResult.NOT_FOUND,
+    }
+    assert run(storage.call_get_event(1))["coefficient"] == 2.5
+
+    results = run(storage.update_coefficients({1: (3.0, 99)}))
+    assert results == {1: CoefficientUpdateResult.OUTDATED}
+    results = run(storage.update_coefficients({1: (2.5, 101)}))
+    assert results == {1: CoefficientUpdateResult.UNCHANGED}
+    assert run(storage.call_get_event(1))["coefficient"] == 2.5
+
+
+def test_find_events_by_state_deadline_and_coefficient(storage, run):
+    now = int(time.time())
+    for i, coefficient in enumerate([1.5, 2.0, 2.5, 3.0]):
+        create(storage, run, coefficient=coefficient, deadline=now + 100 * (i + 1))
+    run(storage.update_event(4, EventState.FINISHED_WIN.value))
+    run(storage.update_coefficients({1: (2.75, 100)}))
+
+    def find(**filters):
+        _, events = run(storage.find_events(EventFilter(**filters)))
+        return [event["event_id"] for event in events]
+
+    assert find() == [1, 2, 3, 4]
+    assert find(state=EventState.NEW) == [1, 2, 3]
+    # границы дедлайна исключаются, коэффициента - включаются
+    assert find(deadline_after=now + 100, deadline_before=now + 400) == [2, 3]
+    assert find(coefficient_min=2.0, coefficient_max=2.75) == [1, 2, 3]
+    assert find(coefficient_min=2.6) == [1, 4]
+    assert find(state=EventState.NEW, coefficient_min=2.6) == [1]
+
+    run(storage.delete_event(1))
+    assert find(coefficient_min=2.6) == [4]
+
+
+def test_find_events_offsets(storage, run):
+    create(storage, run, count=5)
+
+    next_offset, events = run(storage.find_events(EventFilter(), offset=0, limit=3))
+    assert (next_offset, [event["event_id"] for event in events]) == (3, [1, 2, 3])
+    next_offset, events = run(storage.find_events(EventFilter(), offset=3, limit=3))
+    assert (next_offset, [event["event_id"] for event in events]) == (0, [4, 5])
+
+
+def test_changes_since_version(storage, run):
+    create(storage, run, count=3)
+    version = run(storage.get_catalogue_version())
+    run(storage.update_coefficients({2: (4.0, 100)}))
+    run(storage.delete_event(3))
+
+    changes = run(storage.get_changes(str(version), limit=10))
+
+    assert [event["event_id"] for event in changes["events"]] == [2]
+    assert changes["deleted"] == [3]
+    assert changes["has_more"] is False
+    assert changes["version"] == str(version + 2)
+
+
+def test_full_sync_skips_deletions_and_carries_watermark(storage, run):
+    create(storage, run, count=3)
+    run(storage.delete_event(2))
+
+    changes = run(storage.get_changes("0", limit=1))
+    assert changes["deleted"] == []
+    assert changes["has_more"] is True
+    assert changes["version"] == "1:4"
+
+    changes = run(storage.get_changes(changes["version"], limit=10))
+    assert [event["event_id"] for event in changes["events"]] == [3]
+    assert changes["has_more"] is False
+
+
+def test_trimmed_tombstones_require_full_resync(storage, run, monkeypatch):
+    monkeypatch.setattr(settings, "changes_tombstone_retention", 2)
+    create(storage, run, count=4)
+    stale_version = str(run(storage.get_catalogue_version()))
+    for event_id in (1, 2, 3):
+        run(storage.delete_event(event_id))
+    create(storage, run, count=2)
+
+    changes = run(storage.get_changes("0", limit=10))
+    assert int(changes["min_version"]) > int(stale_version)
+    assert len(storage.tombstones) <= 2
+    with pytest.raises(HTTPException) as error:
+        run(storage.get_changes(stale_version, limit=10))
+    assert error.value.status_code == status.HTTP_410_GONE
+
+
+def test_archive_moves_only_settled_events(storage, run):
+    create(storage, run, count=3)
+    run(storage.update_event(1, EventState.FINISHED_WIN.value))
+    run(storage.update_event(2, EventState.FINISHED_LOSE.value))
+
+    archived = run(storage.archive_settled_events(int(time.time()) + 1, limit=10))
+
+    assert archived == 2
+    assert list(storage.events) == [3]
+    assert run(storage.get_archived_event(1))["state"] == EventState.FINISHED_WIN
+    with pytest.raises(HTTPException) as error:
+        run(storage.get_archived_event(3))
+    assert error.value.status_code == status.HTTP_404_NOT_FOUND
+    changes = run(storage.get_changes("3", limit=10))
+    assert changes["deleted"] == [1, 2]
+
+
+def test_archive_respects_settle_time(storage, run):
+    create(storage, run)
+    run(storage.update_event(1, EventState.FINISHED_WIN.value))
+
+    assert run(storage.archive_settled_events(int(time.time()) - 60, limit=10)) == 0
+    assert 1 in storage.events
+
+
+def test_deadline_closes_betting(storage, run):
+    now = int(time.time())
+    create(storage, run, deadline=now - 10)
+    create(storage, run, deadline=now + 3600)
+
+    assert run(storage.close_expired_betting(now, limit=10)) == 1
+    assert run(storage.close_expired_betting(now, limit=10)) == 0
+    assert OutboxMessageType.BETTING_CLOSED.value in outbox_types(storage)
+    results = run(storage.update_coefficients({1: (2.0, 100), 2: (2.0, 100)}))
+    assert results == {
+        1: CoefficientUpdateResult.BETTING_CLOSED,
+        2: CoefficientUpdateResult.UPDATED,
+    }
+
+
+def test_settled_event_is_not_closed_by_deadline(storage, run):
+    now = int(time.time())
+    create(storage, run, deadline=now - 10)
+    run(storage.update_event(1, EventState.FINISHED_WIN.value))
+
+    assert run(storage.close_expired_betting(now, limit=10)) == 0